@@ -0,0 +1,413 @@
+"""
+Workbook backups for Ollama Excel Studio
+Snapshots are reflinked (copy-on-write) where the filesystem supports it and
+otherwise copied by a background worker right after each write, so the
+pre-write state of the next write is already saved. An index replaces
+directory scans and a background pruner enforces max_backups_per_file.
+Backups the Excel service made itself (before this manager took over) are
+imported into the index once at startup and restored through the service.
+
+Hardlinks are not used: openpyxl saves workbooks in place, which would
+rewrite the linked backup too.
+"""
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from core.config import Settings
+from core.cache import file_version
+from core.fileio import copy_file, mapped
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FICLONE = 0x40049409  # _IOW(0x94, 9, int)
+PRUNE_INTERVAL = 60.0
+
+
+def reflink(src: Path, dst: Path) -> bool:
+    """Clone src into dst sharing extents (btrfs, XFS, APFS-style CoW); False if unsupported"""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+class BackupIndex:
+    """Backup metadata per workbook, persisted as JSON next to the snapshots"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.path = directory / "index.json"
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self._rebuild()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Backup index unreadable ({e}), rebuilding")
+            self._rebuild()
+
+    def _rebuild(self):
+        """Recover the index from the snapshot files (one-time scan)"""
+        self.entries = {}
+        if not self.directory.exists():
+            return
+        for folder in self.directory.iterdir():
+            if not folder.is_dir():
+                continue
+            for path in sorted(folder.iterdir()):
+                if path.name.startswith("."):
+                    continue
+                stat = path.stat()
+                self.entries.setdefault(folder.name, []).append({
+                    "id": path.stem,
+                    "filename": folder.name,
+                    "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+                    "size": stat.st_size,
+                    "version": None,
+                    "method": "unknown"
+                })
+        self.save()
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self.entries)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+
+    def add(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.entries.setdefault(entry["filename"], []).append(entry)
+        self.save()
+
+    def merge_legacy(self, filename: str, legacy: List[Dict[str, Any]]) -> int:
+        """Add service-made backups not indexed yet, keeping entries oldest first"""
+        with self._lock:
+            entries = self.entries.setdefault(filename, [])
+            known = {entry["id"] for entry in entries}
+            added = [entry for entry in legacy if entry["id"] not in known]
+            if added:
+                entries.extend(added)
+                entries.sort(key=lambda entry: str(entry["created_at"]))
+        if added:
+            self.save()
+        return len(added)
+
+    def list(self, filename: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.entries.get(filename, []))
+
+    def latest(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self.entries.get(filename)
+            return entries[-1] if entries else None
+
+    def find(self, filename: str, backup_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for entry in self.entries.get(filename, []):
+                if entry["id"] == backup_id:
+                    return entry
+        return None
+
+    def filenames(self) -> List[str]:
+        with self._lock:
+            return list(self.entries)
+
+    def count(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self.entries),
+                "backups": sum(len(entries) for entries in self.entries.values())
+            }
+
+    def trim(self, keep: int, live_versions: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Drop all but the newest `keep` snapshots per file, returning the dropped ones
+
+        A newest entry matching the file's live version (`live_versions`) is a copy
+        of the current file, not a restore point, so it does not use up a slot.
+        Legacy entries belong to the Excel service and are left alone.
+        """
+        live_versions = live_versions or {}
+        dropped = []
+        with self._lock:
+            for filename, entries in self.entries.items():
+                snapshots = [entry for entry in entries if entry["method"] != "legacy"]
+                limit = keep
+                if snapshots and snapshots[-1]["version"] is not None \
+                        and snapshots[-1]["version"] == live_versions.get(filename):
+                    limit += 1
+                if len(snapshots) > limit:
+                    cut = snapshots[:len(snapshots) - limit]
+                    dropped.extend(cut)
+                    self.entries[filename] = [entry for entry in entries if entry not in cut]
+        if dropped:
+            self.save()
+        return dropped
+
+
+class BackupManager:
+    """Takes backups around writes without copying on the request path"""
+
+    def __init__(self, settings: Settings, executor):
+        self.settings = settings
+        self.executor = executor
+        self.directory = Path(settings.excel.backup_directory) / "snapshots"
+        self.index = BackupIndex(self.directory)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._snapshot_locks: Dict[str, threading.Lock] = {}
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._queued: Set[str] = set()
+        self._prune_wanted = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def _source(self, filename: str) -> Path:
+        return Path(self.settings.excel.directory) / Path(filename).name
+
+    def _backup_path(self, entry: Dict[str, Any]) -> Path:
+        suffix = Path(entry["filename"]).suffix
+        return self.directory / entry["filename"] / f"{entry['id']}{suffix}"
+
+    def _lock(self, filename: str) -> asyncio.Lock:
+        name = Path(filename).name
+        if name not in self._locks:
+            self._locks[name] = asyncio.Lock()
+        return self._locks[name]
+
+    def _is_backed_up(self, filename: str) -> bool:
+        """True if the current on-disk version already has a snapshot"""
+        latest = self.index.latest(Path(filename).name)
+        try:
+            return latest is not None and latest["version"] == file_version(self._source(filename))
+        except FileNotFoundError:
+            return True  # nothing to back up yet
+
+    def snapshot(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Snapshot the current file; runs in a worker thread
+
+        The file's write lock is not held, so a copy that raced a save (the
+        version changed while copying) is discarded; the writer's own
+        post-write snapshot covers that version.
+        """
+        source = self._source(filename)
+        with self._snapshot_locks.setdefault(source.name, threading.Lock()):
+            if not source.exists() or self._is_backed_up(filename):
+                return None
+
+            version = file_version(source)
+            entry = {
+                "id": datetime.utcnow().strftime("%Y%m%dT%H%M%S%f"),
+                "filename": source.name,
+                "created_at": datetime.utcnow().isoformat(),
+                "size": source.stat().st_size,
+                "version": version,
+                "method": "reflink"
+            }
+            path = self._backup_path(entry)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.tmp")
+            if not reflink(source, tmp):
+                entry["method"] = "copy"
+                copy_file(source, tmp)
+            if file_version(source) != version:
+                tmp.unlink(missing_ok=True)
+                return None
+            os.replace(tmp, path)
+
+            self.index.add(entry)
+            return entry
+
+    async def _snapshot(self, filename: str):
+        if await self.executor.run_io(self.snapshot, filename) is not None:
+            self._prune_wanted.set()
+
+    @asynccontextmanager
+    async def writing(self, filename: str):
+        """Hold the file while it is modified; its previous state is saved first if it was not already
+
+        The snapshot is taken before the lock, so other writers are not held up by the copy.
+        """
+        if self.settings.excel.auto_backup and not self._is_backed_up(filename):
+            await self._snapshot(filename)
+        async with self._lock(filename):
+            yield
+        self.schedule(filename)
+
+    @asynccontextmanager
+    async def writing_many(self, filenames):
+        """`writing` for several files, locked in a fixed order to avoid deadlocks"""
+        async with AsyncExitStack() as stack:
+            for name in sorted({Path(f).name for f in filenames}):
+                await stack.enter_async_context(self.writing(name))
+            yield
+
+    def schedule(self, filename: str):
+        """Queue a background snapshot of the file's new version"""
+        name = Path(filename).name
+        if self.settings.excel.auto_backup and name not in self._queued:
+            self._queued.add(name)
+            self._queue.put_nowait(name)
+
+    async def _snapshot_worker(self):
+        while True:
+            name = await self._queue.get()
+            self._queued.discard(name)
+            try:
+                await self._snapshot(name)
+            except Exception as e:
+                logger.error(f"Background backup of {name} failed: {e}")
+
+    def prune(self) -> int:
+        """Delete backups beyond max_backups_per_file; returns how many were removed"""
+        live_versions = {}
+        for filename in self.index.filenames():
+            try:
+                live_versions[filename] = file_version(self._source(filename))
+            except FileNotFoundError:
+                pass
+        dropped = self.index.trim(max(self.settings.excel.max_backups_per_file, 1), live_versions)
+        for entry in dropped:
+            self._backup_path(entry).unlink(missing_ok=True)
+        if dropped:
+            logger.info(f"Pruned {len(dropped)} old backups")
+        return len(dropped)
+
+    async def _prune_worker(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._prune_wanted.wait(), timeout=PRUNE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._prune_wanted.clear()
+            try:
+                await self.executor.run_io(self.prune)
+            except Exception as e:
+                logger.error(f"Backup pruning failed: {e}")
+
+    async def import_legacy(self, list_backups: Callable[[str], Awaitable[Optional[List[Any]]]]):
+        """Merge the Excel service's own backups of every workbook into the index"""
+        directory = Path(self.settings.excel.directory)
+        names = await self.executor.run_io(
+            lambda: sorted(p.name for p in directory.iterdir() if p.is_file()) if directory.exists() else []
+        )
+        imported = 0
+        for name in names:
+            try:
+                legacy = await list_backups(name) or []
+            except Exception as e:
+                logger.debug(f"No service backups for {name}: {e}")
+                continue
+            entries = []
+            for item in legacy:
+                backup_id = (item.get("id") or item.get("backup_id")) if isinstance(item, dict) else None
+                if backup_id is None:
+                    continue
+                entries.append({
+                    **item,
+                    "id": str(backup_id),
+                    "filename": name,
+                    "created_at": str(item.get("created_at", "")),
+                    "version": None,
+                    "method": "legacy"
+                })
+            if entries:
+                try:
+                    imported += await self.executor.run_io(self.index.merge_legacy, name, entries)
+                except Exception as e:
+                    logger.error(f"Importing service backups of {name} failed: {e}")
+        if imported:
+            logger.info(f"Imported {imported} service backups into the backup index")
+
+    def list(self, filename: str) -> List[Dict[str, Any]]:
+        """Backups for a file, newest first, from the index; `current` marks a copy of the live file"""
+        try:
+            live = file_version(self._source(filename))
+        except FileNotFoundError:
+            live = None
+        entries = [
+            {
+                **entry,
+                "source": "legacy" if entry["method"] == "legacy" else "index",
+                "current": entry["version"] is not None and entry["version"] == live
+            }
+            for entry in self.index.list(Path(filename).name)
+        ]
+        entries.sort(key=lambda entry: str(entry["created_at"]), reverse=True)
+        return entries
+
+    def find(self, filename: str, backup_id: str) -> Optional[Dict[str, Any]]:
+        return self.index.find(Path(filename).name, backup_id)
+
+    async def restore(self, filename: str, backup_id: str,
+                      replace: Callable[[str, Any], Awaitable[Any]]) -> Dict[str, Any]:
+        """Write a snapshot back through `replace(filename, contents)`, snapshotting the current state first
+
+        `replace` is the Excel service's own save path, so its caches and
+        history see the restore like any other write. It gets a read-only map
+        of the snapshot, not a copy of its bytes.
+        """
+        entry = self.index.find(Path(filename).name, backup_id)
+        if entry is None or entry["method"] == "legacy":
+            raise FileNotFoundError(f"Backup not found: {backup_id}")
+
+        with mapped(self._backup_path(entry)) as contents:
+            async with self.writing(filename):
+                await replace(entry["filename"], contents)
+        return {"restored": backup_id, "filename": entry["filename"], "created_at": entry["created_at"]}
+
+    def apply_settings(self, settings: Settings):
+        if settings.excel.max_backups_per_file != self.settings.excel.max_backups_per_file:
+            self._prune_wanted.set()
+        self.settings = settings
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self, list_legacy: Optional[Callable[[str], Awaitable[Optional[List[Any]]]]] = None):
+        """Start the snapshot and prune workers, and import `list_legacy` backups in the background"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._snapshot_worker()),
+                asyncio.create_task(self._prune_worker())
+            ]
+            if list_legacy is not None:
+                self._tasks.append(asyncio.create_task(self.import_legacy(list_legacy)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.index.count(), "pending": self.pending}
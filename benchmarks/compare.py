@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark reports produced by run.py
+Exits non-zero when a scenario regresses beyond the threshold
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, "r") as f:
+        report = json.load(f)
+    return report, {r["scenario"]: r for r in report["results"]}
+
+
+def change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Allowed p95 latency increase / throughput drop in percent")
+    args = parser.parse_args()
+
+    base_report, base = load(args.baseline)
+    cand_report, cand = load(args.candidate)
+    print(f"baseline  {base_report['commit'][:12]}  {base_report['timestamp']}")
+    print(f"candidate {cand_report['commit'][:12]}  {cand_report['timestamp']}\n")
+    print(f"{'scenario':<12} {'p50 ms':>18} {'p95 ms':>18} {'rps':>18}")
+
+    regressions = []
+    for name in base:
+        if name not in cand:
+            continue
+        b, c = base[name], cand[name]
+        p50 = change(b["latency_ms"]["p50"], c["latency_ms"]["p50"])
+        p95 = change(b["latency_ms"]["p95"], c["latency_ms"]["p95"])
+        rps = change(b["throughput_rps"], c["throughput_rps"])
+        print(f"{name:<12} {c['latency_ms']['p50']:>9.1f} ({p50:+6.1f}%) "
+              f"{c['latency_ms']['p95']:>9.1f} ({p95:+6.1f}%) "
+              f"{c['throughput_rps']:>9.1f} ({rps:+6.1f}%)")
+        if p95 > args.threshold or rps < -args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\nRegressions beyond {args.threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama server for Ollama Excel Studio benchmarks
+Implements the subset of the Ollama HTTP API the studio uses, streaming
+tokens at a configurable rate so chat latency is reproducible without a GPU
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import uvicorn
+
+MODELS = ["qwen2.5:32b-instruct", "qwen2.5:14b-instruct", "llama3.1:8b-instruct"]
+
+app = FastAPI(title="Fake Ollama")
+config = {
+    "token_rate": 30.0,
+    "ttft_ms": 200.0,
+    "tokens": 120,
+    "load_ms": 0.0
+}
+loaded = {}
+
+
+def _tokens(count: int):
+    words = ["The", " total", " revenue", " for", " the", " North", " region", " is", " 1,234", "."]
+    return [words[i % len(words)] for i in range(count)]
+
+
+async def _ensure_loaded(model: str):
+    """Simulate a cold model load the first time a model is used"""
+    if model not in loaded and config["load_ms"]:
+        await asyncio.sleep(config["load_ms"] / 1000)
+    loaded[model] = time.time()
+
+
+async def _stream(model: str, kind: str):
+    await _ensure_loaded(model)
+    await asyncio.sleep(config["ttft_ms"] / 1000)
+    delay = 1 / config["token_rate"] if config["token_rate"] > 0 else 0
+    tokens = _tokens(config["tokens"])
+    for i, token in enumerate(tokens):
+        if kind == "chat":
+            body = {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+        else:
+            body = {"model": model, "response": token, "done": False}
+        yield json.dumps(body) + "\n"
+        if i < len(tokens) - 1:
+            await asyncio.sleep(delay)
+    yield json.dumps({"model": model, "done": True, "eval_count": len(tokens)}) + "\n"
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"name": m, "model": m, "size": 0} for m in MODELS]}
+
+
+@app.get("/api/ps")
+async def ps():
+    return {"models": [{"name": m, "model": m} for m in loaded]}
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    model = body.get("model", MODELS[-1])
+    if body.get("stream", True):
+        return StreamingResponse(_stream(model, "chat"), media_type="application/x-ndjson")
+
+    text = "".join([chunk async for chunk in _stream(model, "chat")])
+    content = "".join(
+        json.loads(line).get("message", {}).get("content", "") for line in text.splitlines()
+    )
+    return {"model": model, "message": {"role": "assistant", "content": content}, "done": True}
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    model = body.get("model", MODELS[-1])
+    if not body.get("prompt"):
+        # Empty prompt: Ollama just loads the model
+        await _ensure_loaded(model)
+        return {"model": model, "response": "", "done": True}
+    if body.get("stream", True):
+        return StreamingResponse(_stream(model, "generate"), media_type="application/x-ndjson")
+    return {"model": model, "response": "".join(_tokens(config["tokens"])), "done": True}
+
+
+@app.post("/api/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    prompt = body.get("prompt", "")
+    # Deterministic pseudo-embedding from character codes
+    vector = [0.0] * 64
+    for i, ch in enumerate(prompt):
+        vector[i % 64] += (ord(ch) % 31) / 31
+    return {"embedding": vector}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-rate", type=float, default=config["token_rate"], help="Tokens per second")
+    parser.add_argument("--ttft-ms", type=float, default=config["ttft_ms"], help="Delay before the first token")
+    parser.add_argument("--tokens", type=int, default=config["tokens"], help="Tokens per response")
+    parser.add_argument("--load-ms", type=float, default=config["load_ms"], help="Simulated cold model load")
+    args = parser.parse_args()
+
+    config.update(token_rate=args.token_rate, ttft_ms=args.ttft_ms, tokens=args.tokens, load_ms=args.load_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Synthetic workbook generator for Ollama Excel Studio benchmarks
+Writes deterministic sales-style .xlsx files with openpyxl's write-only mode
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from openpyxl import Workbook
+
+HEADERS = ["date", "region", "product", "customer", "quantity", "unit_price", "revenue", "notes"]
+REGIONS = ["North", "South", "East", "West", "Central"]
+PRODUCTS = [f"SKU-{i:04d}" for i in range(250)]
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def generate(path: Path, rows: int, sheets: int = 1, seed: int = 42) -> float:
+    """Write a workbook with `rows` data rows per sheet; returns seconds taken"""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    start_date = date(2024, 1, 1)
+
+    wb = Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        ws = wb.create_sheet(f"Data{sheet_index + 1}" if sheets > 1 else "Data")
+        ws.append(HEADERS)
+        for i in range(rows):
+            quantity = rng.randint(1, 50)
+            unit_price = round(rng.uniform(1, 500), 2)
+            ws.append([
+                start_date + timedelta(days=i % 730),
+                rng.choice(REGIONS),
+                rng.choice(PRODUCTS),
+                f"C{rng.randint(1, 20000):05d}",
+                quantity,
+                unit_price,
+                round(quantity * unit_price, 2),
+                "priority" if rng.random() < 0.05 else None
+            ])
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark workbooks")
+    parser.add_argument("--output", default="./data/excel-files", help="Target directory")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Row counts to generate (one file per count)")
+    parser.add_argument("--sheets", type=int, default=1, help="Sheets per workbook")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="Overwrite existing files")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    for rows in args.rows:
+        path = output / f"bench_{rows}.xlsx"
+        if path.exists() and not args.force:
+            print(f"skip  {path} (exists)")
+            continue
+        elapsed = generate(path, rows, args.sheets, args.seed)
+        size_mb = path.stat().st_size / 1048576
+        print(f"wrote {path} ({rows} rows x {args.sheets} sheets, {size_mb:.1f} MB) in {elapsed:.1f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
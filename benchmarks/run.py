@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Load scenarios for Ollama Excel Studio
+Drives the running API with concurrent clients and writes a machine-readable
+JSON report that can be compared across commits with compare.py
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+SCENARIOS = ["excel_read", "excel_write", "batch", "chat", "ws_fanout"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], errors: int, elapsed: float, **extra) -> Dict[str, Any]:
+    """Latency/throughput summary in milliseconds and requests per second"""
+    ms = [v * 1000 for v in latencies]
+    return {
+        "scenario": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "min": round(min(ms), 2) if ms else 0.0,
+            "mean": round(statistics.fmean(ms), 2) if ms else 0.0,
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+            "max": round(max(ms), 2) if ms else 0.0
+        },
+        **extra
+    }
+
+
+async def run_load(name: str, request: Callable[[int], Awaitable[None]],
+                   total: int, concurrency: int) -> Dict[str, Any]:
+    """Issue `total` requests with at most `concurrency` in flight"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                await request(i)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(name, latencies, errors, time.perf_counter() - started, concurrency=concurrency)
+
+
+async def scenario_excel_read(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    async def request(i):
+        r = await client.post("/api/excel/read", json={
+            "filename": args.workbook, "sheet_name": args.sheet, "range": args.range
+        })
+        r.raise_for_status()
+    return await run_load("excel_read", request, args.requests, args.concurrency)
+
+
+async def scenario_excel_write(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    rows = [[f"r{r}c{c}" for c in range(8)] for r in range(args.write_rows)]
+
+    async def request(i):
+        r = await client.post("/api/excel/write", json={
+            "filename": args.write_workbook, "sheet_name": args.sheet,
+            "data": rows, "start_cell": f"A{2 + (i % 1000) * args.write_rows}"
+        })
+        r.raise_for_status()
+    return await run_load("excel_write", request, args.requests, args.concurrency)
+
+
+async def scenario_batch(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    operations = [
+        {"operation": "read", "filename": args.workbook, "sheet_name": args.sheet, "range": args.range}
+        for _ in range(args.batch_size)
+    ]
+
+    async def request(i):
+        r = await client.post("/api/batch/execute", json={"operations": operations, "parallel": True})
+        r.raise_for_status()
+    return await run_load("batch", request, max(args.requests // 10, 1), args.concurrency)
+
+
+async def scenario_chat(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    async def request(i):
+        r = await client.post("/api/chat", json={
+            "message": "Summarize total revenue by region", "context": {}, "files": [args.workbook]
+        })
+        r.raise_for_status()
+    return await run_load("chat", request, max(args.requests // 10, 1), args.concurrency)
+
+
+async def scenario_ws_fanout(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    """Connect N WebSocket clients, trigger writes and time broadcast delivery"""
+    import websockets
+
+    ws_url = args.base_url.replace("http", "ws", 1) + "/ws/chat"
+    connections = [await websockets.connect(ws_url, max_size=None) for _ in range(args.ws_clients)]
+    for ws in connections:
+        await ws.recv()  # connection_established
+
+    latencies: List[float] = []
+    errors = 0
+    started = time.perf_counter()
+    try:
+        for i in range(args.ws_rounds):
+            sent = time.perf_counter()
+            r = await client.post("/api/excel/write", json={
+                "filename": args.write_workbook, "sheet_name": args.sheet,
+                "data": [[i]], "start_cell": "J1"
+            })
+            if r.status_code != 200:
+                errors += 1
+                continue
+
+            async def receive(ws):
+                while True:
+                    message = json.loads(await ws.recv())
+                    if message.get("type") == "file_updated":
+                        return time.perf_counter() - sent
+
+            try:
+                latencies.extend(await asyncio.wait_for(
+                    asyncio.gather(*[receive(ws) for ws in connections]), timeout=30
+                ))
+            except asyncio.TimeoutError:
+                errors += 1
+    finally:
+        for ws in connections:
+            await ws.close()
+
+    return summarize("ws_fanout", latencies, errors, time.perf_counter() - started,
+                     clients=args.ws_clients, rounds=args.ws_rounds)
+
+
+RUNNERS = {
+    "excel_read": scenario_excel_read,
+    "excel_write": scenario_excel_write,
+    "batch": scenario_batch,
+    "chat": scenario_chat,
+    "ws_fanout": scenario_ws_fanout
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+async def main_async(args) -> Dict[str, Any]:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        results = []
+        for name in args.scenarios:
+            print(f"running {name}...", file=sys.stderr)
+            result = await RUNNERS[name](client, args)
+            lat = result["latency_ms"]
+            print(f"  {result['throughput_rps']} rps, p50 {lat['p50']}ms, p95 {lat['p95']}ms, "
+                  f"errors {result['errors']}", file=sys.stderr)
+            results.append(result)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "base_url": args.base_url
+        },
+        "parameters": {
+            "workbook": args.workbook,
+            "requests": args.requests,
+            "concurrency": args.concurrency
+        },
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Ollama Excel Studio load scenarios")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--workbook", default="bench_100000.xlsx", help="File read by read/batch/chat")
+    parser.add_argument("--write-workbook", default="bench_10000.xlsx", help="File modified by write/fan-out")
+    parser.add_argument("--sheet", default="Data")
+    parser.add_argument("--range", default="A1:H1000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--write-rows", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--ws-rounds", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", default=None, help="Report path (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    output = Path(args.output) if args.output else (
+        Path(__file__).parent / "results" / f"{report['commit'][:12]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {output}", file=sys.stderr)
+    return 0 if all(r["errors"] == 0 for r in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
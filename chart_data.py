@@ -0,0 +1,226 @@
+"""
+Chart data pipeline for Ollama Excel Studio
+Reduces sheet data to roughly one point per horizontal pixel before it is
+sent to the browser
+"""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from core.config import Settings
+from core.cache import VersionedCache
+from core.query_engine import QueryEngine
+
+logger = logging.getLogger(__name__)
+
+LINE_TYPES = {"line", "area"}
+SCATTER_TYPES = {"scatter"}
+CATEGORY_TYPES = {"pie", "bar"}
+HISTOGRAM_TYPES = {"histogram"}
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: pick `threshold` indices preserving visual shape"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Interior points split into threshold - 2 equally sized buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        px, py = x[previous], y[previous]
+        areas = np.abs(
+            (px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py)
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+
+    return selected
+
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """Keep the min and max point of each bucket (2 * buckets points at most)"""
+    n = len(y)
+    if buckets * 2 >= n or buckets < 1:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        chunk = y[start:end]
+        indices.append(start + int(np.argmin(chunk)))
+        indices.append(start + int(np.argmax(chunk)))
+    return np.unique(np.asarray(indices, dtype=np.int64))
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    """Numeric view of a column (datetimes become int64 nanoseconds)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("int64").to_numpy(dtype=np.float64)
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _json_values(series: pd.Series) -> List[Any]:
+    """Convert a column to JSON-safe Python values"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return [v.isoformat() if pd.notna(v) else None for v in series]
+    values = series.astype(object).where(pd.notna(series), None).tolist()
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
+
+
+class ChartDataPipeline:
+    """Prepares downsampled chart series, cached per sheet version and chart spec"""
+
+    def __init__(self, settings: Settings, query_engine: QueryEngine, max_entries: int = 128):
+        self.settings = settings
+        self.query_engine = query_engine
+        self.cache = VersionedCache(max_entries)
+
+    @property
+    def target_points(self) -> int:
+        return int(self.settings.ui.chart_defaults.get("width", 800))
+
+    @staticmethod
+    def _pick_columns(frame: pd.DataFrame, options: Dict[str, Any]):
+        """Resolve x and y columns from options, defaulting to first column / numeric columns"""
+        x = options.get("x") or frame.columns[0]
+        y = options.get("y")
+        if y is None:
+            y = [c for c in frame.select_dtypes("number").columns if c != x][:1]
+        elif isinstance(y, str):
+            y = [y]
+
+        missing = [c for c in [x, *y] if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {missing}")
+        if not y:
+            raise ValueError("No numeric column available for the y axis")
+        return x, list(y)
+
+    def _points(self, frame: pd.DataFrame, chart_type: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        x_col, y_cols = self._pick_columns(frame, options)
+        # Both reducers bucket consecutive rows, so buckets must be contiguous in x
+        frame = frame.sort_values(x_col, kind="stable")
+        x = _numeric(frame[x_col])
+        if np.isnan(x).all():
+            x = np.arange(len(frame), dtype=np.float64)
+
+        method = options.get("downsample") or ("minmax" if chart_type in SCATTER_TYPES else "lttb")
+        target = int(options.get("max_points") or self.target_points)
+
+        keep = []
+        for col in y_cols:
+            y = _numeric(frame[col])
+            valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+            if method == "minmax":
+                idx = minmax_indices(y[valid], max(target // 2, 1))
+            else:
+                idx = lttb_indices(x[valid], y[valid], target)
+            keep.append(valid[idx])
+
+        rows = frame.iloc[np.unique(np.concatenate(keep))] if keep else frame.iloc[:0]
+        return {
+            "method": method,
+            "series": [
+                {"name": str(col), "x": _json_values(rows[x_col]), "y": _json_values(rows[col])}
+                for col in y_cols
+            ]
+        }
+
+    def _categories(self, frame: pd.DataFrame, chart_type: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        label_col, value_cols = self._pick_columns(frame, options)
+        top_n = int(options.get("top_n") or (10 if chart_type == "pie" else max(self.target_points // 20, 1)))
+
+        grouped = frame.groupby(label_col, dropna=False)[value_cols[0]].sum().sort_values(ascending=False)
+        head, rest = grouped.iloc[:top_n], grouped.iloc[top_n:]
+
+        labels = [str(label) for label in head.index]
+        values = _json_values(head)
+        if len(rest):
+            labels.append(options.get("other_label", "Other"))
+            values.append(float(rest.sum()))
+
+        return {
+            "method": "top_n",
+            "series": [{"name": str(value_cols[0]), "labels": labels, "values": values}]
+        }
+
+    def _histogram(self, frame: pd.DataFrame, options: Dict[str, Any]) -> Dict[str, Any]:
+        column = options.get("x") or options.get("y")
+        if column is None:
+            numeric = frame.select_dtypes("number").columns
+            if not len(numeric):
+                raise ValueError("No numeric column available for the histogram")
+            column = numeric[0]
+        if isinstance(column, list):
+            column = column[0]
+        if column not in frame.columns:
+            raise ValueError(f"Unknown columns: {[column]}")
+
+        values = _numeric(frame[column])
+        values = values[~np.isnan(values)]
+        bins = options.get("bins") or "auto"
+        edges = np.histogram_bin_edges(values, bins=bins)
+        if len(edges) - 1 > self.target_points:
+            edges = np.histogram_bin_edges(values, bins=self.target_points)
+        counts, edges = np.histogram(values, bins=edges)
+
+        return {
+            "method": "binning",
+            "series": [{"name": str(column), "bins": edges.tolist(), "counts": counts.tolist()}]
+        }
+
+    def prepare(self, filename: str, sheet_name: Optional[str], chart_type: str,
+                data_range: Optional[str], options: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return downsampled series for a chart, or None if the chart type is not reduced"""
+        options = options or {}
+        chart_type = (chart_type or "").lower()
+        if chart_type not in LINE_TYPES | SCATTER_TYPES | CATEGORY_TYPES | HISTOGRAM_TYPES:
+            return None
+
+        frame, version = self.query_engine.load_frame(filename, sheet_name, data_range)
+        spec = json.dumps(
+            {"sheet": sheet_name, "type": chart_type, "range": data_range,
+             "options": options, "target": self.target_points},
+            sort_keys=True, default=str
+        )
+        key = (Path(filename).name, version, spec)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if chart_type in CATEGORY_TYPES:
+            prepared = self._categories(frame, chart_type, options)
+        elif chart_type in HISTOGRAM_TYPES:
+            prepared = self._histogram(frame, options)
+        else:
+            prepared = self._points(frame, chart_type, options)
+
+        prepared.update({
+            "chart_type": chart_type,
+            "source_rows": len(frame),
+            "version": version
+        })
+        self.cache.set(key, prepared)
+        return prepared
@@ -0,0 +1,192 @@
+"""
+Negotiated response compression for Ollama Excel Studio
+zstd (when the zstandard package is installed) or gzip for responses above a
+size threshold; already-compressed and streaming-event types pass through
+"""
+from typing import Dict, Optional
+import asyncio
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies above this size are compressed in a worker thread instead of on the loop
+THREAD_THRESHOLD = 256 * 1024
+
+UNCOMPRESSIBLE_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/octet-stream",
+    "application/vnd.openxmlformats",
+    "application/vnd.ms-excel",
+    "text/event-stream"
+)
+
+
+def available_encodings() -> tuple:
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, supported: tuple) -> Optional[str]:
+    """Pick the best supported content-coding from an Accept-Encoding header"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Encoder:
+    """Incremental gzip/zstd encoder with flush points for streamed bodies"""
+
+    def __init__(self, encoding: str, gzip_level: int, zstd_level: int):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._zstd = zstandard.ZstdCompressor(level=zstd_level)
+            self._obj = self._zstd.compressobj()
+        else:
+            self._gzip_level = gzip_level
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress_all(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self._zstd.compress(data)
+        obj = zlib.compressobj(self._gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return obj.compress(data) + obj.flush()
+
+    def compress_chunk(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses the client accepts compressed"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _Responder(self, _Encoder(encoding, self.gzip_level, self.zstd_level), send)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, encoder: _Encoder, send: Send):
+        self.middleware = middleware
+        self.encoder = encoder
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.mode: Optional[str] = None  # "passthrough" | "stream"
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start_message["status"] in (204, 206, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return not content_type.startswith(UNCOMPRESSIBLE_TYPES)
+
+    def _mark_encoded(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoder.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # The compressed body is a different representation; keep validators matching weakly
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            # e.g. http.response.pathsend: the start message must still go first, unmodified
+            if self.mode is None:
+                self.mode = "passthrough"
+                await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        if self.mode == "passthrough":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode == "stream":
+            chunk = self.encoder.compress_chunk(body) if body else b""
+            if not more_body:
+                chunk += self.encoder.finish()
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        # First body message decides how the response is handled
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if not self._compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+            self.mode = "passthrough"
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        self._mark_encoded(headers)
+        if not more_body:
+            if len(body) > THREAD_THRESHOLD:
+                compressed = await asyncio.to_thread(self.encoder.compress_all, body)
+            else:
+                compressed = self.encoder.compress_all(body)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        self.mode = "stream"
+        del headers["Content-Length"]
+        await self._send(self.start_message)
+        await self._send({
+            "type": "http.response.body",
+            "body": self.encoder.compress_chunk(body),
+            "more_body": True
+        })
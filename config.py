@@ -7,7 +7,7 @@ from pydantic_settings import BaseSettings
 from typing import List, Optional
 from pathlib import Path
 import json
-from functools import lru_cache
+import threading
 
 
 class ServerConfig(BaseModel):
@@ -17,6 +17,9 @@ class ServerConfig(BaseModel):
     api_port: int = 8000
     enable_cors: bool = False
     allowed_origins: List[str] = ["http://localhost:3000"]
+    compression_minimum_size: int = 1024
+    gzip_level: int = 6
+    zstd_level: int = 3
 
 
 class OllamaConfig(BaseModel):
@@ -32,6 +35,11 @@ class OllamaConfig(BaseModel):
     temperature: float = 0.2
     stream_response: bool = True
     timeout_seconds: int = 120
+    preload_on_startup: bool = True
+    keep_alive: str = "30m"
+    keep_warm_schedule: str = "*/10 8-17 * * 1-5"  # cron; working hours
+    resident_poll_seconds: int = 30
+    latency_fallback: bool = True
 
 
 class ExcelConfig(BaseModel):
@@ -66,6 +74,43 @@ class UIConfig(BaseModel):
     }
 
 
+class CacheConfig(BaseModel):
+    """Render and computation cache settings"""
+    directory: str = "./data/cache"
+    render_cache_max_bytes: int = 268435456  # 256MB
+    render_workers: int = 2
+    prerender_charts: bool = False
+    response_cache_entries: int = 32
+    response_cache_max_item_bytes: int = 8388608  # 8MB
+
+
+class WorkersConfig(BaseModel):
+    """Worker pool sizing"""
+    io_threads: int = 8
+    cpu_processes: int = 2
+    loop_lag_warn_ms: int = 250
+    pdf_processes: int = 2
+    pdf_timeout_seconds: int = 300
+
+
+class SchedulerConfig(BaseModel):
+    """Scheduled job storage and limits (enabled by features.enable_scheduler)"""
+    jobs_file: str = "./data/schedules.json"
+    results_directory: str = "./data/cache/scheduled"
+    max_concurrent_jobs: int = 2
+
+
+class RetrievalConfig(BaseModel):
+    """Row retrieval for grounding chat in large workbooks"""
+    enabled: bool = True
+    top_k: int = 8
+    max_context_chars: int = 6000
+    max_rows_per_sheet: int = 100000
+    embedding_model: Optional[str] = None  # e.g. "nomic-embed-text"; lexical only when unset
+    embedding_weight: float = 0.5
+    max_embedded_rows: int = 20000
+
+
 class SecurityConfig(BaseModel):
     """Security settings"""
     enable_auth: bool = False
@@ -79,6 +124,9 @@ class LoggingConfig(BaseModel):
     directory: str = "./logs"
     max_files: int = 10
     max_file_size: int = 10485760  # 10MB
+    enable_tracing: bool = False
+    trace_buffer_size: int = 100
+    enable_debug_endpoints: bool = False
 
 
 class Settings(BaseSettings):
@@ -88,6 +136,10 @@ class Settings(BaseSettings):
     excel: ExcelConfig = Field(default_factory=ExcelConfig)
     features: FeaturesConfig = Field(default_factory=FeaturesConfig)
     ui: UIConfig = Field(default_factory=UIConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    workers: WorkersConfig = Field(default_factory=WorkersConfig)
+    scheduler: SchedulerConfig = Field(default_factory=SchedulerConfig)
+    retrieval: RetrievalConfig = Field(default_factory=RetrievalConfig)
     security: SecurityConfig = Field(default_factory=SecurityConfig)
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
     
@@ -110,22 +162,31 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
+def read_config_file(config_path: str = "./config/studio.json") -> Settings:
+    """Load and validate configuration from JSON file, raising on any error"""
+    with open(config_path, 'r') as f:
+        config_data = json.load(f)
+    
+    return Settings(
+        server=ServerConfig(**config_data.get("server", {})),
+        ollama=OllamaConfig(**config_data.get("ollama", {})),
+        excel=ExcelConfig(**config_data.get("excel", {})),
+        features=FeaturesConfig(**config_data.get("features", {})),
+        ui=UIConfig(**config_data.get("ui", {})),
+        cache=CacheConfig(**config_data.get("cache", {})),
+        workers=WorkersConfig(**config_data.get("workers", {})),
+        scheduler=SchedulerConfig(**config_data.get("scheduler", {})),
+        retrieval=RetrievalConfig(**config_data.get("retrieval", {})),
+        security=SecurityConfig(**config_data.get("security", {})),
+        logging=LoggingConfig(**config_data.get("logging", {}))
+    )
+
+
 def load_config_from_file(config_path: str = "./config/studio.json") -> Settings:
     """Load configuration from JSON file"""
     try:
         if Path(config_path).exists():
-            with open(config_path, 'r') as f:
-                config_data = json.load(f)
-            
-            return Settings(
-                server=ServerConfig(**config_data.get("server", {})),
-                ollama=OllamaConfig(**config_data.get("ollama", {})),
-                excel=ExcelConfig(**config_data.get("excel", {})),
-                features=FeaturesConfig(**config_data.get("features", {})),
-                ui=UIConfig(**config_data.get("ui", {})),
-                security=SecurityConfig(**config_data.get("security", {})),
-                logging=LoggingConfig(**config_data.get("logging", {}))
-            )
+            return read_config_file(config_path)
     except Exception as e:
         print(f"Warning: Could not load config from {config_path}: {e}")
         print("Using default configuration")
@@ -133,10 +194,25 @@ def load_config_from_file(config_path: str = "./config/studio.json") -> Settings
     return Settings()
 
 
-@lru_cache()
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+
 def get_settings() -> Settings:
-    """Get cached settings instance"""
-    return load_config_from_file()
+    """Get the current settings instance"""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = load_config_from_file()
+    return _settings
+
+
+def set_settings(settings: Settings):
+    """Replace the current settings instance (used by the config watcher)"""
+    global _settings
+    with _settings_lock:
+        _settings = settings
 
 
 def save_config(settings: Settings, config_path: str = "./config/studio.json"):
@@ -147,6 +223,10 @@ def save_config(settings: Settings, config_path: str = "./config/studio.json"):
         "excel": settings.excel.model_dump(),
         "features": settings.features.model_dump(),
         "ui": settings.ui.model_dump(),
+        "cache": settings.cache.model_dump(),
+        "workers": settings.workers.model_dump(),
+        "scheduler": settings.scheduler.model_dump(),
+        "retrieval": settings.retrieval.model_dump(),
         "security": settings.security.model_dump(),
         "logging": settings.logging.model_dump()
     }
@@ -158,4 +238,7 @@ def save_config(settings: Settings, config_path: str = "./config/studio.json"):
 
 
 # Export for easy imports
-__all__ = ['Settings', 'get_settings', 'save_config', 'load_config_from_file']
+__all__ = [
+    'Settings', 'get_settings', 'set_settings', 'save_config',
+    'load_config_from_file', 'read_config_file'
+]
@@ -0,0 +1,129 @@
+"""
+Live configuration reload for Ollama Excel Studio
+Watches studio.json, validates changes, swaps the Settings instance and
+notifies subscribers so they can resize pools and caches without a restart
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from pathlib import Path
+import asyncio
+import logging
+
+from core.config import Settings, get_settings, set_settings, read_config_file
+from core.cache import file_version
+
+logger = logging.getLogger(__name__)
+
+# Settings that are only read at startup; changes are applied on next restart
+RESTART_REQUIRED = {
+    "server.host",
+    "server.api_port",
+    "server.enable_cors",
+    "server.allowed_origins",
+    "server.compression_minimum_size",
+    "server.gzip_level",
+    "server.zstd_level",
+    "excel.directory",
+    "excel.backup_directory",
+    "cache.directory",
+    "logging.directory"
+}
+
+# Returns the changed keys it could not apply live (or None)
+SettingsCallback = Callable[[Settings, Settings], Optional[Iterable[str]]]
+
+
+def diff_settings(old: Settings, new: Settings) -> List[str]:
+    """Dotted names of the fields that differ between two settings objects"""
+    old_data, new_data = old.model_dump(), new.model_dump()
+    changed = []
+    for section, values in new_data.items():
+        for key, value in values.items():
+            if old_data.get(section, {}).get(key) != value:
+                changed.append(f"{section}.{key}")
+    return changed
+
+
+class ConfigWatcher:
+    """Polls the config file and hot-swaps validated settings"""
+
+    def __init__(self, config_path: str = "./config/studio.json", interval: float = 2.0):
+        self.config_path = Path(config_path)
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self._subscribers: List[SettingsCallback] = []
+        self._version: Optional[str] = self._current_version()
+        self._task: Optional[asyncio.Task] = None
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            return file_version(self.config_path)
+        except FileNotFoundError:
+            return None
+
+    def subscribe(self, callback: SettingsCallback):
+        """Call `callback(old, new)` after every successful reload
+
+        Keys the callback returns are reported as restart-required.
+        """
+        self._subscribers.append(callback)
+
+    def reload(self) -> Dict[str, Any]:
+        """Validate the config file and apply it if anything changed"""
+        self._version = self._current_version()
+        try:
+            new = read_config_file(str(self.config_path))
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Config reload rejected, keeping current settings: {e}")
+            raise ValueError(f"Invalid configuration: {e}")
+
+        self.last_error = None
+        old = get_settings()
+        changed = diff_settings(old, new)
+        if not changed:
+            return {"changed": [], "restart_required": []}
+
+        set_settings(new)
+        unapplied = set()
+        for callback in self._subscribers:
+            try:
+                unapplied.update(callback(old, new) or ())
+            except Exception as e:
+                logger.error(f"Config subscriber {callback!r} failed: {e}")
+
+        restart_required = [key for key in changed if key in RESTART_REQUIRED or key in unapplied]
+        logger.info(f"Configuration reloaded: {', '.join(changed)}")
+        if restart_required:
+            logger.warning(f"Restart required to apply: {', '.join(restart_required)}")
+        return {"changed": changed, "restart_required": restart_required}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            version = self._current_version()
+            if version is None or version == self._version:
+                continue
+            try:
+                self.reload()
+            except ValueError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "config_path": str(self.config_path),
+            "version": self._version,
+            "last_error": self.last_error
+        }
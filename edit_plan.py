@@ -0,0 +1,218 @@
+"""
+Edit plans for Ollama Excel Studio
+A multi-step edit proposed by chat is validated and optimized as a whole:
+writes are overlaid so overwritten cells are dropped, adjacent cells are
+merged into rectangular blocks and operations are grouped by workbook.
+Each workbook's blocks are then applied as one Excel service batch, so the
+edit keeps the service's history and undo
+"""
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import re
+
+PLAN_OPERATIONS = {"write", "create_sheet"}
+PLAN_EXTENSIONS = {".xlsx", ".xlsm"}
+JSON_BLOCK = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+PLAN_INSTRUCTIONS = (
+    "To propose spreadsheet edits, include one ```json block of the form "
+    '{"operations": [{"operation": "write" | "create_sheet", "filename": ..., '
+    '"sheet_name": ..., "data": [[...]], "start_cell": "A1"}]}'
+)
+
+
+class EditOperation(BaseModel):
+    """One step of an edit plan (same fields as ExcelOperationRequest)"""
+    operation: str
+    filename: str
+    sheet_name: str
+    data: Optional[List[List[Any]]] = None
+    start_cell: str = "A1"
+
+
+class EditPlan(BaseModel):
+    """Structured multi-step edit, as proposed by chat"""
+    operations: List[EditOperation]
+    description: Optional[str] = None
+
+
+@dataclass
+class CellBlock:
+    """A rectangle of values written from its top-left cell"""
+    sheet: str
+    row: int
+    column: int
+    values: List[List[Any]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        from openpyxl.utils import get_column_letter
+
+        return {
+            "sheet_name": self.sheet,
+            "start_cell": f"{get_column_letter(self.column)}{self.row}",
+            "rows": len(self.values),
+            "columns": len(self.values[0]),
+            "data": self.values
+        }
+
+
+@dataclass
+class WorkbookPlan:
+    """Everything a plan does to one workbook"""
+    filename: str
+    create_sheets: List[str] = field(default_factory=list)
+    cells: Dict[str, Dict[Tuple[int, int], Any]] = field(default_factory=dict)
+
+    @property
+    def cell_count(self) -> int:
+        return sum(len(cells) for cells in self.cells.values())
+
+    def blocks(self) -> List[CellBlock]:
+        """Final cell values merged into as few rectangles as possible"""
+        blocks: List[CellBlock] = []
+        for sheet, cells in self.cells.items():
+            # Contiguous runs within each row...
+            runs: List[Tuple[int, int, List[Any]]] = []
+            for (row, column), value in sorted(cells.items()):
+                if runs and runs[-1][0] == row and runs[-1][1] + len(runs[-1][2]) == column:
+                    runs[-1][2].append(value)
+                else:
+                    runs.append((row, column, [value]))
+            # ...stacked with identical runs on the following rows
+            open_blocks: Dict[Tuple[int, int], CellBlock] = {}
+            for row, column, values in runs:
+                key = (column, len(values))
+                block = open_blocks.get(key)
+                if block is not None and block.row + len(block.values) == row:
+                    block.values.append(values)
+                else:
+                    block = CellBlock(sheet, row, column, [values])
+                    blocks.append(block)
+                    open_blocks[key] = block
+        return blocks
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "filename": self.filename,
+            "create_sheets": self.create_sheets,
+            "cells": self.cell_count,
+            "blocks": [block.to_dict() for block in self.blocks()]
+        }
+
+
+@dataclass
+class CompiledPlan:
+    workbooks: List[WorkbookPlan]
+    operations: int
+    cells_proposed: int
+
+    @property
+    def cells_written(self) -> int:
+        return sum(workbook.cell_count for workbook in self.workbooks)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "operations": self.operations,
+            "cells_proposed": self.cells_proposed,
+            "cells_written": self.cells_written,
+            "workbooks": [workbook.to_dict() for workbook in self.workbooks]
+        }
+
+
+def extract_plan(response: Dict[str, Any]) -> Optional[EditPlan]:
+    """Edit plan from a chat result: a `plan` field, or a JSON block in the reply text"""
+    candidates: List[Any] = []
+    if response.get("plan"):
+        candidates.append(response["plan"])
+    for key in ("response", "message", "content"):
+        if isinstance(response.get(key), str):
+            for block in JSON_BLOCK.findall(response[key]):
+                try:
+                    candidates.append(json.loads(block))
+                except ValueError:
+                    continue
+
+    for candidate in candidates:
+        if isinstance(candidate, list):
+            candidate = {"operations": candidate}
+        if not isinstance(candidate, dict) or not candidate.get("operations"):
+            continue
+        try:
+            return EditPlan(**candidate)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _coordinates(cell: str) -> Tuple[int, int]:
+    from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
+
+    try:
+        column, row = coordinate_from_string(cell)
+        return row, column_index_from_string(column)
+    except ValueError:
+        raise ValueError(f"Invalid start cell: {cell}")
+
+
+def compile_plan(plan: EditPlan) -> CompiledPlan:
+    """Validate a plan and reduce it to the final state per workbook; raises ValueError"""
+    if not plan.operations:
+        raise ValueError("Plan has no operations")
+
+    workbooks: Dict[str, WorkbookPlan] = {}
+    cells_proposed = 0
+    for step, op in enumerate(plan.operations, 1):
+        if op.operation not in PLAN_OPERATIONS:
+            raise ValueError(f"Step {step}: unknown operation {op.operation}. Available: {sorted(PLAN_OPERATIONS)}")
+        name = Path(op.filename).name
+        if Path(name).suffix.lower() not in PLAN_EXTENSIONS:
+            raise ValueError(f"Step {step}: plans can only edit {sorted(PLAN_EXTENSIONS)} workbooks")
+        workbook = workbooks.setdefault(name, WorkbookPlan(name))
+
+        if op.operation == "create_sheet":
+            if op.sheet_name not in workbook.create_sheets:
+                workbook.create_sheets.append(op.sheet_name)
+            continue
+
+        if not op.data or not any(op.data):
+            raise ValueError(f"Step {step}: write needs data")
+        top, left = _coordinates(op.start_cell)
+        # Later steps overwrite earlier ones, so only the final value of each cell is kept
+        cells = workbook.cells.setdefault(op.sheet_name, {})
+        for row_offset, values in enumerate(op.data):
+            for column_offset, value in enumerate(values):
+                cells[(top + row_offset, left + column_offset)] = value
+                cells_proposed += 1
+
+    return CompiledPlan(list(workbooks.values()), len(plan.operations), cells_proposed)
+
+
+def batch_operations(workbook_plan: WorkbookPlan, sheetnames: List[str]) -> List[Dict[str, Any]]:
+    """One workbook's share of a plan as excel_service.execute_batch operations
+
+    Sheets are created first and each merged block becomes one write, so the
+    service applies (and records) far fewer steps than the chat proposed.
+    Every target is checked against `sheetnames` first, so a bad plan leaves
+    the file unchanged.
+    """
+    created = [name for name in workbook_plan.create_sheets if name not in sheetnames]
+    missing = [name for name in workbook_plan.cells if name not in sheetnames and name not in created]
+    if missing:
+        raise ValueError(f"{workbook_plan.filename}: no such sheet(s) {missing}")
+
+    operations = [
+        {"operation": "create_sheet", "filename": workbook_plan.filename, "sheet_name": name}
+        for name in created
+    ]
+    for block in workbook_plan.blocks():
+        operations.append({
+            "operation": "write",
+            "filename": workbook_plan.filename,
+            "sheet_name": block.sheet,
+            "data": block.values,
+            "start_cell": block.to_dict()["start_cell"]
+        })
+    return operations
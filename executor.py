@@ -0,0 +1,243 @@
+"""
+Blocking work executor for Ollama Excel Studio
+openpyxl parsing and zip I/O are synchronous and must stay off the main loop:
+- Excel/chart/template service methods are coroutines that do their blocking
+  work inline and may keep loop-bound state (locks), so they all run on one
+  dedicated service thread with its own event loop
+- stateless blocking calls (queries, file copies, serialization) run on a
+  bounded I/O thread pool
+- sheet parsing for queries and charts runs on a process pool
+Event loop lag is sampled to confirm the main loop stays responsive.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import functools
+import inspect
+import logging
+import multiprocessing
+import threading
+import time
+
+from core.config import Settings
+from core.metrics import BLOCKING_CALL_LATENCY
+from core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+def _operation_name(fn: Callable, args) -> str:
+    return getattr(fn, "__name__", "call")
+
+
+class ServiceLoop:
+    """An event loop on its own thread that the stateful services are confined to"""
+
+    def __init__(self, name: str = "excel-service"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call `fn` on the service thread and await its (possibly async) result"""
+        async def run():
+            result = fn(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+        future = asyncio.run_coroutine_threadsafe(run(), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            if not thread.is_alive():
+                loop.close()
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from a fixed sleep"""
+
+    def __init__(self, interval: float = 0.1, warn_ms: float = 250):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max((loop.time() - started - self.interval) * 1000, 0.0)
+
+            self.last_ms = lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+            self.total_ms += lag_ms
+            self.samples += 1
+            if lag_ms > self.warn_ms:
+                logger.warning(f"Event loop lag {lag_ms:.0f}ms")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get event loop lag statistics"""
+        return {
+            "last_ms": round(self.last_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+            "avg_ms": round(self.total_ms / self.samples, 2) if self.samples else 0.0,
+            "samples": self.samples
+        }
+
+
+class BlockingExecutor:
+    """Runs blocking calls off the event loop on bounded pools"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.io_pool = ThreadPoolExecutor(
+            max_workers=settings.workers.io_threads,
+            thread_name_prefix="excel-io"
+        )
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self.lag_monitor = LoopLagMonitor(warn_ms=settings.workers.loop_lag_warn_ms)
+        self.service_loop = ServiceLoop()
+        self.pending_io = 0
+        self.pending_service = 0
+        self.pending_cpu = 0
+        self._cpu_lock = threading.Lock()
+
+    @property
+    def cpu_pool(self) -> Optional[Executor]:
+        if self.settings.workers.cpu_processes <= 0:
+            return None
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=self.settings.workers.cpu_processes,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._cpu_pool
+
+    async def run_io(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking, stateless call on the I/O thread pool"""
+        loop = asyncio.get_running_loop()
+        self.pending_io += 1
+        started = time.perf_counter()
+        try:
+            with span(_operation_name(fn, args), pool="io"):
+                return await loop.run_in_executor(self.io_pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending_io -= 1
+            BLOCKING_CALL_LATENCY.labels(pool="io", operation=_operation_name(fn, args)).observe(
+                time.perf_counter() - started
+            )
+
+    async def run_service(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a service method to completion on the service thread
+
+        The services' coroutines do blocking openpyxl work inline; on the
+        service loop that blocks only other service calls, never the main loop.
+        Their asyncio state stays on that one loop, so it is never shared
+        between threads.
+        """
+        self.pending_service += 1
+        started = time.perf_counter()
+        try:
+            with span(_operation_name(fn, args), pool="service"):
+                return await self.service_loop.call(fn, *args, **kwargs)
+        finally:
+            self.pending_service -= 1
+            BLOCKING_CALL_LATENCY.labels(pool="service", operation=_operation_name(fn, args)).observe(
+                time.perf_counter() - started
+            )
+
+    def call_cpu(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a picklable, stateless CPU-heavy function on the process pool and wait for it
+
+        Called from I/O pool threads (e.g. to parse a sheet), so it blocks;
+        runs inline when the process pool is disabled.
+        """
+        pool = self.cpu_pool
+        if pool is None:
+            return fn(*args, **kwargs)
+
+        with self._cpu_lock:
+            self.pending_cpu += 1
+        started = time.perf_counter()
+        try:
+            with span(_operation_name(fn, args), pool="cpu"):
+                return pool.submit(fn, *args, **kwargs).result()
+        finally:
+            with self._cpu_lock:
+                self.pending_cpu -= 1
+            BLOCKING_CALL_LATENCY.labels(pool="cpu", operation=_operation_name(fn, args)).observe(
+                time.perf_counter() - started
+            )
+
+    def apply_settings(self, settings: Settings):
+        """Resize pools for new settings; in-flight calls finish on the old pools"""
+        old = self.settings.workers
+        self.settings = settings
+        self.lag_monitor.warn_ms = settings.workers.loop_lag_warn_ms
+
+        if settings.workers.io_threads != old.io_threads:
+            old_pool = self.io_pool
+            self.io_pool = ThreadPoolExecutor(
+                max_workers=settings.workers.io_threads,
+                thread_name_prefix="excel-io"
+            )
+            old_pool.shutdown(wait=False)
+
+        if settings.workers.cpu_processes != old.cpu_processes and self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False)
+            self._cpu_pool = None
+
+    def start(self):
+        self.lag_monitor.start()
+
+    async def shutdown(self):
+        await self.lag_monitor.stop()
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+        self.service_loop.stop()
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool and event loop statistics"""
+        return {
+            "io_threads": self.settings.workers.io_threads,
+            "cpu_processes": self.settings.workers.cpu_processes,
+            "pending_io": self.pending_io,
+            "pending_service": self.pending_service,
+            "pending_cpu": self.pending_cpu,
+            "event_loop_lag": self.lag_monitor.get_stats()
+        }
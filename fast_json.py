@@ -0,0 +1,71 @@
+"""
+Fast JSON serialization for Ollama Excel Studio
+orjson for HTTP responses and WebSocket messages, plus reuse of pre-serialized
+bodies for responses that are served repeatedly
+"""
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from core.cache import VersionedCache
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+def dumps_text(content: Any) -> str:
+    """Serialize to a JSON string (for WebSocket text frames)"""
+    return dumps(content).decode()
+
+
+class JSONBytesResponse(Response):
+    """Response for a body that is already serialized JSON"""
+    media_type = "application/json"
+
+
+class ResponseCache:
+    """Serialized response bodies keyed by ETag, so identical responses skip encoding"""
+
+    def __init__(self, max_entries: int = 32, max_item_bytes: int = 8388608):
+        self.bodies = VersionedCache(max_entries)
+        self.max_item_bytes = max_item_bytes
+
+    def get(self, etag: str, headers: Optional[Dict[str, str]] = None) -> Optional[Response]:
+        body = self.bodies.get(etag)
+        if body is None:
+            return None
+        return JSONBytesResponse(body, headers={**(headers or {}), "X-Cache": "HIT"})
+
+    def store(self, etag: str, content: Any) -> bytes:
+        """Serialize `content` and keep the bytes if they fit the per-item limit"""
+        body = dumps(content)
+        if len(body) <= self.max_item_bytes:
+            self.bodies.set(etag, body)
+        return body
+
+    def resize(self, max_entries: int, max_item_bytes: int):
+        self.bodies.max_entries = max_entries
+        self.max_item_bytes = max_item_bytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.bodies.get_stats()
@@ -0,0 +1,119 @@
+"""
+Zero-copy file helpers for Ollama Excel Studio
+Copies stay in the kernel (copy_file_range, then sendfile) so large workbooks
+are never read into Python memory. APIs that insist on bytes get a read-only
+memory map of the file instead.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, List, Union
+import errno
+import logging
+import mmap
+import os
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK = 8 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+
+# Errors meaning "this syscall can't copy between these files", not real I/O failures
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _read_write(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    data = os.pread(src_fd, min(count, READ_CHUNK), offset)
+    if not data:
+        return 0
+    return os.pwrite(dst_fd, data, offset)
+
+
+_COPY_METHODS: List[Callable[[int, int, int, int], int]] = [
+    method for method, available in (
+        (_copy_file_range, hasattr(os, "copy_file_range")),
+        (_sendfile, hasattr(os, "sendfile")),
+        (_read_write, True)
+    ) if available
+]
+
+
+def copy_fd(src_fd: int, dst_fd: int, size: int) -> int:
+    """Copy the first `size` bytes of one descriptor to another, kernel-side when possible"""
+    copied = 0
+    for method in _COPY_METHODS:
+        try:
+            while copied < size:
+                n = method(src_fd, dst_fd, copied, min(size - copied, COPY_CHUNK))
+                if n == 0:
+                    return copied
+                copied += n
+            return copied
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRNOS or method is _read_write:
+                raise
+            logger.debug(f"{method.__name__} unavailable ({e}), falling back")
+    return copied
+
+
+def _copy_into(src_fd: int, dst: Path) -> int:
+    """Copy a descriptor into `dst` through a temp file and an atomic rename"""
+    size = os.fstat(src_fd).st_size
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as out:
+            copied = copy_fd(src_fd, out.fileno(), size)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return copied
+
+
+def copy_file(src: Union[str, Path], dst: Union[str, Path]) -> int:
+    """Atomically copy a file without reading it into Python, returns bytes copied"""
+    src, dst = Path(src), Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with open(src, "rb") as f:
+        return _copy_into(f.fileno(), dst)
+
+
+def upload_size(upload: BinaryIO, max_bytes: int) -> int:
+    """Size of a spooled upload, checked against the limit without reading it"""
+    fd = upload.fileno()  # rolls small in-memory uploads over to disk
+    size = os.fstat(fd).st_size
+    if size > max_bytes:
+        raise ValueError(f"File too large. Max size: {max_bytes} bytes")
+    return size
+
+
+@contextmanager
+def mapped(source: Union[BinaryIO, str, Path]) -> Iterator[Union[mmap.mmap, bytes]]:
+    """Read-only memory map of a file path or open binary file, for APIs that take bytes
+
+    Pages come from the page cache on demand, so the file is never copied into
+    a Python bytes object.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            with mapped(f) as view:
+                yield view
+        return
+
+    fd = source.fileno()
+    if os.fstat(fd).st_size == 0:
+        yield b""  # empty files cannot be mapped
+        return
+    view = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    try:
+        yield view
+    finally:
+        view.close()
@@ -0,0 +1,163 @@
+"""
+HTTP caching helpers for Ollama Excel Studio
+Strong ETags from the workbook version, Last-Modified, conditional GETs (304)
+and single byte-range downloads (206)
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+import hashlib
+import json
+import os
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+DOWNLOAD_CHUNK = 1024 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Requested byte range lies outside the file"""
+
+
+def validators(path: Union[str, Path], *variant) -> Dict[str, str]:
+    """ETag/Last-Modified headers for a file, optionally varied by request parameters
+
+    The ETag is the file version (mtime + size); `variant` distinguishes different
+    representations of the same file, e.g. a sheet and range of a read.
+    """
+    stat = os.stat(path)
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    if variant:
+        digest = hashlib.sha1(json.dumps(variant, default=str).encode()).hexdigest()[:16]
+        etag = f"{etag}-{digest}"
+    return {
+        "ETag": f'"{etag}"',
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache"
+    }
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def _not_modified_since(header: str, last_modified: str) -> bool:
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """True when the client's cached copy is still current (GET/HEAD only; 304 is not valid otherwise)"""
+    if request.method not in ("GET", "HEAD"):
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, headers["ETag"])
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        return _not_modified_since(if_modified_since, headers["Last-Modified"])
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def conditional_response(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    """304 for a current GET/HEAD copy, 412 when If-None-Match matches on other methods (RFC 9110)"""
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    if_none_match = request.headers.get("if-none-match")
+    if request.method not in ("GET", "HEAD") and if_none_match is not None \
+            and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=412, headers=headers)
+    return None
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=start-end" range into inclusive offsets
+
+    Returns None for headers we don't handle (multiple ranges, other units), in
+    which case the full file is sent.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if not start_text:
+            length = int(end_text)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _iter_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(DOWNLOAD_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request: Request, path: Union[str, Path], filename: str, media_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a file with validators, 304 for unchanged copies and single-range 206
+
+    `headers` overrides the validators, e.g. for a file derived from a workbook
+    and regenerated per request, whose own mtime says nothing about its content.
+    """
+    path = Path(path)
+    headers = dict(headers) if headers is not None else validators(path)
+    conditional = conditional_response(request, headers)
+    if conditional is not None:
+        return conditional
+
+    headers["Accept-Ranges"] = "bytes"
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (headers["ETag"], headers["Last-Modified"])):
+        size = path.stat().st_size
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+        if byte_range is not None:
+            start, end = byte_range
+            headers.update({
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+                "Content-Disposition": f'attachment; filename="{filename}"'
+            })
+            return StreamingResponse(
+                _iter_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+
+    response = FileResponse(path=path, filename=filename, media_type=media_type, headers=headers)
+    response.chunk_size = DOWNLOAD_CHUNK
+    return response
@@ -141,6 +141,8 @@ kaleido==0.2.1
 aiofiles==23.2.1
 websockets==12.0
 httpx==0.26.0
+orjson==3.9.10
+zstandard==0.22.0
 python-jose[cryptography]==3.3.0
 passlib[bcrypt]==1.7.4
 EOF
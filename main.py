@@ -2,40 +2,58 @@
 Ollama Excel Studio - FastAPI Backend v5.0
 Main application entry point
 """
-from fastapi import FastAPI, WebSocket, HTTPException, UploadFile, File, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from core.startup import lazy_service, startup_profile
+
+with startup_profile.phase("import fastapi"):
+    from fastapi import FastAPI, WebSocket, HTTPException, UploadFile, File, Depends, Request, Response
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, ORJSONResponse
 from contextlib import asynccontextmanager
 import json
 import os
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
 import asyncio
+import inspect
 import logging
+import time
 from datetime import datetime
 
-# Import our services
-from services.ollama import OllamaService
-from services.excel import ExcelService
-from services.charts import ChartService
-from services.templates import TemplateService
-from models.requests import (
-    ChatRequest,
-    ExcelOperationRequest,
-    ChartRequest,
-    TemplateRequest,
-    BatchOperationRequest
-)
-from models.responses import (
-    ChatResponse,
-    ExcelOperationResponse,
-    FileListResponse,
-    ChartResponse,
-    OperationHistoryResponse
-)
-from core.config import get_settings
-from core.websocket_manager import WebSocketManager
+# Services are imported lazily on first use (see "Initialize services")
+with startup_profile.phase("import models"):
+    from models.requests import (
+        ChatRequest,
+        ExcelOperationRequest,
+        ChartRequest,
+        TemplateRequest,
+        BatchOperationRequest
+    )
+    from models.responses import (
+        ChatResponse,
+        ExcelOperationResponse,
+        FileListResponse,
+        ChartResponse,
+        OperationHistoryResponse
+    )
+with startup_profile.phase("import core"):
+    from core.config import get_settings
+    from core.config_watcher import ConfigWatcher, diff_settings
+    from core.websocket_manager import WebSocketManager
+    from core.query_engine import QueryRequest
+    from core.render_cache import MEDIA_TYPES, figure_of, with_reduced_data
+    from core.template_engine import TemplateEngine, BulkTemplateRequest
+    from core.edit_plan import EditPlan, PLAN_INSTRUCTIONS, compile_plan, batch_operations, extract_plan
+    from core.pdf_export import PDFExporter
+    from core.executor import BlockingExecutor
+    from core.fileio import mapped, upload_size
+    from core.http_cache import validators, conditional_response, file_response
+    from core.fast_json import ResponseCache, JSONBytesResponse, dumps_text
+    from core.compression import CompressionMiddleware
+    from core.scheduler import Scheduler, ScheduledJobRequest
+    from core.warmup import ModelWarmer
+    from core import metrics
+    from core.tracing import Tracer, TracedRoute, span, sample_stacks
 
 # Setup logging
 logging.basicConfig(
@@ -47,20 +65,105 @@ logger = logging.getLogger(__name__)
 # Load configuration
 settings = get_settings()
 
-# Initialize services
-ollama_service = OllamaService(settings)
-excel_service = ExcelService(settings)
-chart_service = ChartService(settings)
-template_service = TemplateService(settings)
+# Initialize services (heavy ones are built on first use)
+ollama_service = lazy_service("services.ollama", "OllamaService", lambda: (settings,))
+def excel_service_settings(settings):
+    """ExcelService settings with its inline backup copy off; BackupManager takes backups instead"""
+    return settings.model_copy(update={"excel": settings.excel.model_copy(update={"auto_backup": False})})
+
+excel_service = lazy_service("services.excel", "ExcelService", lambda: (excel_service_settings(settings),))
+chart_service = lazy_service("services.charts", "ChartService", lambda: (settings,))
+template_service = lazy_service("services.templates", "TemplateService", lambda: (settings,))
 ws_manager = WebSocketManager()
+executor = BlockingExecutor(settings)
+tracer = Tracer(settings.logging.enable_tracing, settings.logging.trace_buffer_size)
+query_engine = lazy_service("core.query_engine", "QueryEngine", lambda: (settings, executor))
+chart_pipeline = lazy_service("core.chart_data", "ChartDataPipeline", lambda: (settings, query_engine))
+chart_renderer = lazy_service("core.render_cache", "ChartRenderer", lambda: (settings,))
+column_profiler = lazy_service("core.profiles", "ColumnProfiler", lambda: (settings,))
+retrieval_index = lazy_service("core.retrieval", "RetrievalIndex", lambda: (settings, executor))
+backups = lazy_service("core.backups", "BackupManager", lambda: (settings, executor))
+template_engine = TemplateEngine(settings)
+pdf_exporter = PDFExporter(settings)
+response_cache = ResponseCache(
+    settings.cache.response_cache_entries, settings.cache.response_cache_max_item_bytes
+)
+config_watcher = ConfigWatcher()
+scheduler = Scheduler(settings)
+model_warmer = ModelWarmer(settings, lambda: ollama_service.get_current_model())
+background_tasks: Set[asyncio.Task] = set()
 
-# Lifespan context manager
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Startup and shutdown logic"""
-    logger.info("🚀 Starting Ollama Excel Studio v5.0")
-    
-    # Verify Ollama connection on startup
+# Settings the external services without apply_settings may only read when
+# they are built; a reload reports changes to them as restart-required
+SERVICE_BUILD_SETTINGS = {
+    excel_service: {"excel.auto_save", "excel.auto_save_interval"},
+    chart_service: {"ui.chart_defaults", "ui.theme"}
+}
+
+def spawn(coro):
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def apply_log_level(level: str):
+    try:
+        logging.getLogger().setLevel(level.upper())
+    except ValueError as e:
+        logger.warning(f"Ignoring logging.level: {e}")
+
+apply_log_level(settings.logging.level)
+
+def apply_settings(old, new):
+    """Hand reloaded settings to every live service; returns the keys only a restart applies"""
+    global settings
+    settings = new
+    apply_log_level(new.logging.level)
+    executor.apply_settings(new)
+    pdf_exporter.apply_settings(new)
+    tracer.configure(new.logging.enable_tracing, new.logging.trace_buffer_size)
+    template_engine.settings = new
+    response_cache.resize(new.cache.response_cache_entries, new.cache.response_cache_max_item_bytes)
+    scheduler.apply_settings(new)
+    model_warmer.apply_settings(new)
+    if new.features.enable_scheduler and not scheduler.running:
+        scheduler.start()
+    elif not new.features.enable_scheduler and scheduler.running:
+        spawn(scheduler.stop())
+
+    # The Ollama client is built with the service, so rebuild it on next use
+    if ollama_service.is_initialized() and (
+        new.ollama.base_url != old.ollama.base_url
+        or new.ollama.timeout_seconds != old.ollama.timeout_seconds
+    ):
+        retired = ollama_service.reset()
+        close = getattr(retired, "close", None) or getattr(retired, "aclose", None)
+        if callable(close):
+            result = close()
+            if inspect.isawaitable(result):
+                spawn(result)
+
+    changed = set(diff_settings(old, new))
+    unapplied = []
+    for proxy in (ollama_service, excel_service, chart_service, template_service,
+                  query_engine, chart_pipeline, chart_renderer, column_profiler, retrieval_index,
+                  backups):
+        if not proxy.is_initialized():
+            continue
+        service = proxy.resolve()
+        service_settings = excel_service_settings(new) if proxy is excel_service else new
+        if hasattr(service, "apply_settings"):
+            service.apply_settings(service_settings)
+        else:
+            service.settings = service_settings
+            unapplied.extend(changed & SERVICE_BUILD_SETTINGS.get(proxy, set()))
+    return unapplied
+
+config_watcher.subscribe(apply_settings)
+
+async def probe_ollama():
+    """Check the Ollama connection without holding up startup"""
     try:
         await ollama_service.check_connection()
         models = await ollama_service.list_models()
@@ -68,6 +171,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠ Ollama not available: {e}")
         logger.warning("AI features will be limited until Ollama is running")
+
+# Lifespan context manager
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown logic"""
+    logger.info("🚀 Starting Ollama Excel Studio v5.0")
+    executor.start()
+    config_watcher.start()
+    
+    # Verify Ollama connection and preload the preferred model in the background
+    probe_task = asyncio.create_task(probe_ollama())
+    model_warmer.start()
     
     # Ensure data directories exist
     for directory in [
@@ -75,14 +190,33 @@ async def lifespan(app: FastAPI):
         settings.excel.backup_directory,
         settings.export_directory,
         settings.temp_directory,
+        settings.cache.directory,
+        settings.scheduler.results_directory,
         settings.logging.directory
     ]:
         Path(directory).mkdir(parents=True, exist_ok=True)
     
     logger.info("✓ Data directories verified")
     
+    # Load the backup index off the loop, then start the snapshot/prune workers
+    # and index the service's pre-existing backups once
+    await executor.run_io(backups.resolve)
+    backups.start(lambda name: executor.run_service(excel_service.list_backups, name))
+    if settings.features.enable_scheduler:
+        scheduler.start()
+    startup_profile.mark_ready()
+    
     yield
     
+    probe_task.cancel()
+    await model_warmer.stop()
+    await config_watcher.stop()
+    await scheduler.stop()
+    await backups.stop()
+    if chart_renderer.is_initialized():
+        chart_renderer.shutdown()
+    pdf_exporter.shutdown()
+    await executor.shutdown()
     logger.info("👋 Shutting down Ollama Excel Studio")
 
 # Create FastAPI app
@@ -90,7 +224,17 @@ app = FastAPI(
     title="Ollama Excel Studio API",
     description="AI-powered Excel automation with local LLMs",
     version="5.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+app.router.route_class = TracedRoute
+
+# Compress large JSON bodies (zstd or gzip, as the client accepts)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.server.compression_minimum_size,
+    gzip_level=settings.server.gzip_level,
+    zstd_level=settings.server.zstd_level
 )
 
 # Configure CORS
@@ -103,6 +247,62 @@ if not settings.server.enable_cors:
         allow_headers=["*"],
     )
 
+# ── Metrics ────────────────────────────────────────────────────────────
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """Observe request latency per matched route"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.REQUEST_LATENCY.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        ).observe(time.perf_counter() - started)
+
+def collect_runtime_metrics():
+    """Refresh cache, queue and connection gauges before a scrape"""
+    if query_engine.is_initialized():
+        metrics.record_cache("query_frames", query_engine.frames.get_stats())
+        metrics.record_cache("query_results", query_engine.results.get_stats())
+    if chart_pipeline.is_initialized():
+        metrics.record_cache("chart_data", chart_pipeline.cache.get_stats())
+    if chart_renderer.is_initialized():
+        metrics.record_cache("chart_render", chart_renderer.get_stats())
+    metrics.record_cache("responses", response_cache.get_stats())
+    
+    executor_stats = executor.get_stats()
+    metrics.QUEUE_DEPTH.labels(queue="io").set(executor_stats["pending_io"])
+    metrics.QUEUE_DEPTH.labels(queue="service").set(executor_stats["pending_service"])
+    metrics.QUEUE_DEPTH.labels(queue="cpu").set(executor_stats["pending_cpu"])
+    metrics.QUEUE_DEPTH.labels(queue="pdf").set(pdf_exporter.active_jobs)
+    if column_profiler.is_initialized():
+        metrics.QUEUE_DEPTH.labels(queue="profiles").set(column_profiler.pending)
+    if backups.is_initialized():
+        metrics.QUEUE_DEPTH.labels(queue="backups").set(backups.pending)
+    metrics.EVENT_LOOP_LAG.set(executor_stats["event_loop_lag"]["last_ms"] / 1000)
+    
+    ws_stats = ws_manager.get_connection_stats()
+    metrics.WS_ACTIVE_CONNECTIONS.set(ws_stats["active_connections"])
+
+metrics.REGISTRY.add_collector(collect_runtime_metrics)
+
+app.middleware("http")(tracer.middleware)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 # ── Health & Status Endpoints ──────────────────────────────────────────
 
 @app.get("/")
@@ -142,7 +342,7 @@ async def health_check():
     
     # Check Excel service
     try:
-        files = await excel_service.list_files()
+        files = await executor.run_service(excel_service.list_files)
         health_status["services"]["excel"] = {
             "status": "up",
             "files_count": len(files)
@@ -154,6 +354,15 @@ async def health_check():
         }
         health_status["status"] = "degraded"
     
+    health_status["executor"] = executor.get_stats()
+    health_status["models"] = model_warmer.get_stats()
+    health_status["config"] = config_watcher.get_stats()
+    if backups.is_initialized():
+        health_status["backups"] = backups.get_stats()
+    health_status["scheduler"] = scheduler.get_stats()
+    if retrieval_index.is_initialized():
+        health_status["retrieval"] = retrieval_index.get_stats()
+    
     return health_status
 
 @app.get("/api/status")
@@ -162,13 +371,14 @@ async def get_status():
     try:
         models = await ollama_service.list_models()
         current_model = await ollama_service.get_current_model()
-        files = await excel_service.list_files()
+        files = await executor.run_service(excel_service.list_files)
         
         return {
             "ollama": {
                 "connected": True,
                 "current_model": current_model,
                 "available_models": models,
+                "resident_models": list(model_warmer.resident),
                 "base_url": settings.ollama.base_url
             },
             "excel": {
@@ -191,13 +401,34 @@ async def get_status():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/models/warm")
+async def warm_model(model: Optional[str] = None):
+    """Load a model (default: the preferred one) ahead of use"""
+    model = model or model_warmer.preferred_model()
+    if model is None:
+        raise HTTPException(status_code=404, detail="No preferred model is installed")
+    try:
+        seconds = await model_warmer.load(model, "request")
+        return {"success": True, "model": model, "load_seconds": round(seconds, 3)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/config/reload")
+async def reload_config():
+    """Re-read studio.json now instead of waiting for the watcher"""
+    try:
+        result = config_watcher.reload()
+        return {"success": True, **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # ── File Management Endpoints ──────────────────────────────────────────
 
 @app.get("/api/files", response_model=FileListResponse)
 async def list_files():
     """List all Excel files"""
     try:
-        files = await excel_service.list_files()
+        files = await executor.run_service(excel_service.list_files)
         return FileListResponse(success=True, files=files)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -213,31 +444,45 @@ async def upload_file(file: UploadFile = File(...)):
                 detail=f"Invalid file type. Allowed: {settings.features.allowed_extensions}"
             )
         
-        # Validate file size
-        contents = await file.read()
-        if len(contents) > settings.features.max_file_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Max size: {settings.features.max_file_size} bytes"
-            )
+        # Reject oversized uploads from their spooled size, before reading them
+        size = await executor.run_io(upload_size, file.file, settings.features.max_file_size)
         
-        # Save file
-        file_path = await excel_service.save_uploaded_file(file.filename, contents)
+        # Save through the service, handing it a map of the spooled file rather than its bytes
+        with mapped(file.file) as contents:
+            async with backups.writing(file.filename):
+                file_path = await executor.run_service(excel_service.save_uploaded_file, file.filename, contents)
+        column_profiler.schedule(file.filename)
+        retrieval_index.schedule(file.filename)
         
         return {
             "success": True,
             "filename": file.filename,
             "path": str(file_path),
-            "size": len(contents)
+            "size": size
         }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/files/{filename}")
-async def get_file_info(filename: str):
+async def get_file_info(filename: str, request: Request, response: Response):
     """Get detailed file information"""
     try:
-        info = await excel_service.get_file_info(filename)
+        profiles = await column_profiler.get(filename)
+        headers = validators(
+            Path(settings.excel.directory) / Path(filename).name, "info", profiles is not None
+        )
+        conditional = conditional_response(request, headers)
+        if conditional is not None:
+            return conditional
+        
+        info = await executor.run_service(excel_service.get_file_info, filename)
+        if isinstance(info, dict) and profiles is not None:
+            info["column_profiles"] = profiles["sheets"]
+        response.headers.update(headers)
         return info
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
@@ -248,7 +493,9 @@ async def get_file_info(filename: str):
 async def delete_file(filename: str):
     """Delete a file"""
     try:
-        await excel_service.delete_file(filename)
+        await executor.run_service(excel_service.delete_file, filename)
+        column_profiler.remove(filename)
+        retrieval_index.remove(filename)
         return {"success": True, "message": f"File {filename} deleted"}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
@@ -256,14 +503,15 @@ async def delete_file(filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/files/{filename}/download")
-async def download_file(filename: str):
-    """Download a file"""
-    try:
-        file_path = await excel_service.get_file_path(filename)
-        return FileResponse(
-            path=file_path,
-            filename=filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+async def download_file(filename: str, request: Request):
+    """Download a file (supports If-None-Match and Range)"""
+    try:
+        file_path = await executor.run_service(excel_service.get_file_path, filename)
+        return file_response(
+            request,
+            file_path,
+            filename,
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
@@ -272,29 +520,62 @@ async def download_file(filename: str):
 
 # ── Excel Operations Endpoints ─────────────────────────────────────────
 
-@app.post("/api/excel/read", response_model=ExcelOperationResponse)
-async def read_excel(request: ExcelOperationRequest):
-    """Read data from Excel file"""
+async def read_sheet_conditional(http_request: Request, filename: str,
+                                 sheet_name: Optional[str], cell_range: Optional[str]):
+    """Read a sheet range, answering 304 or replaying serialized bytes for unchanged versions"""
     try:
-        result = await excel_service.read_sheet(
-            request.filename,
-            request.sheet_name,
-            request.range
+        headers = validators(
+            Path(settings.excel.directory) / Path(filename).name, "read", sheet_name, cell_range
         )
-        return ExcelOperationResponse(success=True, data=result)
+        conditional = conditional_response(http_request, headers)
+        if conditional is not None:
+            return conditional
+        cached = response_cache.get(headers["ETag"], headers)
+        if cached is not None:
+            return cached
+        
+        result = await executor.run_service(
+            excel_service.read_sheet,
+            filename,
+            sheet_name,
+            cell_range
+        )
+        body = await executor.run_io(
+            response_cache.store, headers["ETag"], ExcelOperationResponse(success=True, data=result)
+        )
+        return JSONBytesResponse(body, headers=headers)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/excel/read", response_model=ExcelOperationResponse)
+async def read_excel(request: ExcelOperationRequest, http_request: Request):
+    """Read data from Excel file"""
+    return await read_sheet_conditional(
+        http_request, request.filename, request.sheet_name, request.range
+    )
+
+@app.get("/api/excel/read", response_model=ExcelOperationResponse)
+async def read_excel_get(http_request: Request, filename: str,
+                         sheet_name: Optional[str] = None, range: Optional[str] = None):
+    """Read data from Excel file (cacheable by browsers and reverse proxies)"""
+    return await read_sheet_conditional(http_request, filename, sheet_name, range)
+
 @app.post("/api/excel/write", response_model=ExcelOperationResponse)
 async def write_excel(request: ExcelOperationRequest):
     """Write data to Excel file"""
     try:
-        result = await excel_service.write_data(
-            request.filename,
-            request.sheet_name,
-            request.data,
-            request.start_cell
-        )
+        async with backups.writing(request.filename):
+            result = await executor.run_service(
+                excel_service.write_data,
+                request.filename,
+                request.sheet_name,
+                request.data,
+                request.start_cell
+            )
+        column_profiler.schedule(request.filename)
+        retrieval_index.schedule(request.filename)
         
         # Notify connected clients
         await ws_manager.broadcast({
@@ -311,7 +592,7 @@ async def write_excel(request: ExcelOperationRequest):
 async def list_sheets(filename: str):
     """List all sheets in a workbook"""
     try:
-        sheets = await excel_service.list_sheets(filename)
+        sheets = await executor.run_service(excel_service.list_sheets, filename)
         return {"success": True, "sheets": sheets}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -320,30 +601,164 @@ async def list_sheets(filename: str):
 async def create_sheet(request: ExcelOperationRequest):
     """Create a new sheet in a workbook"""
     try:
-        result = await excel_service.create_sheet(
-            request.filename,
-            request.sheet_name
-        )
+        async with backups.writing(request.filename):
+            result = await executor.run_service(
+                excel_service.create_sheet,
+                request.filename,
+                request.sheet_name
+            )
         return {"success": True, "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/excel/plan")
+async def apply_edit_plan(plan: EditPlan, dry_run: bool = False):
+    """Validate, optimize and apply a multi-step edit plan as one service batch per workbook"""
+    try:
+        compiled = compile_plan(plan)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if dry_run:
+        return {"success": True, "applied": False, "plan": compiled.to_dict()}
+    
+    async def apply(workbook_plan):
+        try:
+            sheets = await executor.run_service(excel_service.list_sheets, workbook_plan.filename)
+            sheetnames = [s if isinstance(s, str) else s.get("name") for s in sheets]
+            operations = batch_operations(workbook_plan, sheetnames)
+            # One sequential batch per workbook, applied and recorded by the service
+            await executor.run_service(excel_service.execute_batch, operations, False)
+            return {
+                "success": True,
+                "filename": workbook_plan.filename,
+                "sheets_created": [op["sheet_name"] for op in operations if op["operation"] == "create_sheet"],
+                "cells_written": workbook_plan.cell_count,
+                "steps": len(operations)
+            }
+        except Exception as e:
+            logger.error(f"Edit plan failed for {workbook_plan.filename}: {e}")
+            return {"success": False, "filename": workbook_plan.filename, "error": str(e)}
+    
+    async with backups.writing_many([w.filename for w in compiled.workbooks]):
+        results = await asyncio.gather(*(apply(w) for w in compiled.workbooks))
+    
+    applied = [w for w, result in zip(compiled.workbooks, results) if result["success"]]
+    for workbook_plan in applied:
+        column_profiler.schedule(workbook_plan.filename)
+        retrieval_index.schedule(workbook_plan.filename)
+    if applied:
+        # A single message for every workbook the plan touched
+        await ws_manager.broadcast_file_delta("plan", [w.to_dict() for w in applied])
+    
+    return {
+        "success": len(applied) == len(results),
+        "applied": bool(applied),
+        "plan": {k: v for k, v in compiled.to_dict().items() if k != "workbooks"},
+        "results": results
+    }
+
+def query_validators(request: QueryRequest) -> Dict[str, str]:
+    return validators(
+        Path(settings.excel.directory) / Path(request.filename).name,
+        "query", request.model_dump_json()
+    )
+
+@app.post("/api/excel/query")
+async def query_excel(request: QueryRequest, http_request: Request):
+    """Run a vectorized filter/group/aggregate/pivot query over a sheet range"""
+    try:
+        headers = query_validators(request)
+        conditional = conditional_response(http_request, headers)
+        if conditional is not None:
+            return conditional
+        cached = response_cache.get(headers["ETag"], headers)
+        if cached is not None:
+            return cached
+        
+        result = await executor.run_io(query_engine.execute, request)
+        await executor.run_io(
+            response_cache.store, headers["ETag"], {"success": True, "data": {**result, "cached": True}}
+        )
+        return ORJSONResponse({"success": True, "data": result}, headers=headers)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/excel/{filename}/search")
+async def search_rows(filename: str, q: str, top_k: Optional[int] = None):
+    """Rows most relevant to a question, as retrieved for chat grounding"""
+    if not (Path(settings.excel.directory) / Path(filename).name).exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        rows = await retrieval_index.search([filename], q, top_k)
+        return {"success": True, "indexed": retrieval_index.get(filename) is not None, "rows": rows}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ── AI Chat Endpoints ──────────────────────────────────────────────────
 
-@app.post("/api/chat", response_model=ChatResponse)
+async def chat_context(context: Optional[Dict[str, Any]], files: Optional[List[str]],
+                       message: Optional[str]) -> Dict[str, Any]:
+    """Ground the model with column profiles and the rows most relevant to the message"""
+    context = dict(context or {})
+    summaries = await asyncio.gather(*(column_profiler.summarize(name) for name in files or []))
+    profiles = {
+        name: summary
+        for name, summary in zip(files or [], summaries)
+        if summary is not None
+    }
+    if profiles:
+        context["column_profiles"] = profiles
+    
+    # Top-k rows instead of whole sheets keeps the prompt flat as workbooks grow
+    with span("retrieval.search"):
+        rows = await retrieval_index.search(files or [], message or "")
+    if rows:
+        context["relevant_rows"] = rows
+    return context
+
+class PlannedChatResponse(ChatResponse):
+    """Chat reply plus the edit plan it proposes, if any (apply with /api/excel/plan)"""
+    plan: Optional[EditPlan] = None
+
+_takes_model: Dict[str, bool] = {}
+
+def chat_model_options(method: str) -> Dict[str, Any]:
+    """Interactive chat is latency-sensitive: route to a warm model when the service accepts an override"""
+    if method not in _takes_model:
+        _takes_model[method] = "model" in inspect.signature(getattr(ollama_service, method)).parameters
+        if not _takes_model[method] and settings.ollama.latency_fallback:
+            logger.warning(f"OllamaService.{method} takes no model argument; warm-model fallback is disabled for it")
+    if not _takes_model[method]:
+        return {}
+    return {"model": model_warmer.choose(latency_sensitive=True)}
+
+@app.post("/api/chat", response_model=PlannedChatResponse)
 async def chat(request: ChatRequest):
     """Send a message to the AI assistant"""
     try:
-        response = await ollama_service.chat(
-            request.message,
-            request.context,
-            request.files
+        context = await chat_context(request.context, request.files, request.message)
+        context["edit_plan_format"] = PLAN_INSTRUCTIONS
+        started = time.perf_counter()
+        with span("ollama.chat"):
+            response = await ollama_service.chat(
+                request.message,
+                context,
+                request.files,
+                **chat_model_options("chat")
+            )
+        metrics.OLLAMA_REQUEST_LATENCY.labels(endpoint="chat").observe(
+            time.perf_counter() - started
         )
-        return ChatResponse(success=True, **response)
+        return PlannedChatResponse(success=True, **{**response, "plan": extract_plan(response)})
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
     """WebSocket endpoint for real-time chat"""
@@ -354,17 +769,33 @@ async def websocket_chat(websocket: WebSocket):
             
             if data.get("type") == "chat":
                 # Stream response
+                started = time.perf_counter()
+                first_chunk_at = None
+                chunks = 0
+                context = await chat_context(data.get("context"), data.get("files"), data.get("message"))
                 async for chunk in ollama_service.chat_stream(
                     data.get("message"),
-                    data.get("context")
+                    context,
+                    **chat_model_options("chat_stream")
                 ):
-                    await websocket.send_json({
+                    if first_chunk_at is None:
+                        first_chunk_at = time.perf_counter()
+                        metrics.OLLAMA_TTFT.labels(endpoint="ws_chat").observe(first_chunk_at - started)
+                    chunks += 1
+                    await websocket.send_text(dumps_text({
                         "type": "chat_chunk",
                         "content": chunk
-                    })
+                    }))
+                
+                finished = time.perf_counter()
+                metrics.OLLAMA_REQUEST_LATENCY.labels(endpoint="ws_chat").observe(finished - started)
+                if first_chunk_at is not None and finished > first_chunk_at:
+                    metrics.OLLAMA_CHUNKS_PER_SECOND.labels(endpoint="ws_chat").observe(
+                        (chunks - 1) / (finished - first_chunk_at)
+                    )
             
             elif data.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
+                await websocket.send_text(dumps_text({"type": "pong"}))
                 
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
@@ -377,14 +808,47 @@ async def websocket_chat(websocket: WebSocket):
 async def create_chart(request: ChartRequest):
     """Create a chart from Excel data"""
     try:
-        chart_data = await chart_service.create_chart(
+        # Downsample server-side so the browser never receives every row
+        options = dict(request.options or {})
+        prepared = await executor.run_io(
+            chart_pipeline.prepare,
             request.filename,
             request.sheet_name,
             request.chart_type,
             request.data_range,
-            request.options
+            options
         )
+        if prepared is not None:
+            options["prepared_data"] = prepared
+        
+        chart_data = await executor.run_service(
+            chart_service.create_chart,
+            request.filename,
+            request.sheet_name,
+            request.chart_type,
+            request.data_range,
+            options
+        )
+        if prepared is not None:
+            # Ship the reduced series, not the full range chart_service plotted
+            chart_data = with_reduced_data(chart_data, prepared)
+        
+        # Remember the spec so exports can be served from the render cache
+        chart_id = chart_data.get("id") if isinstance(chart_data, dict) else None
+        if chart_id and prepared is not None:
+            spec = {
+                "filename": request.filename,
+                "sheet_name": request.sheet_name,
+                "chart_type": request.chart_type,
+                "data_range": request.data_range,
+                "options": request.options or {}
+            }
+            chart_renderer.register(chart_id, spec, figure_of(chart_data))
+            chart_renderer.prerender(chart_id, prepared)
+        
         return ChartResponse(success=True, chart=chart_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -392,20 +856,40 @@ async def create_chart(request: ChartRequest):
 async def suggest_charts(filename: str, sheet_name: Optional[str] = None):
     """Get chart suggestions based on data"""
     try:
-        suggestions = await chart_service.suggest_charts(filename, sheet_name)
+        # Always derived from column profiles, so the response has one shape
+        suggestions = await column_profiler.suggest(filename, sheet_name)
         return {"success": True, "suggestions": suggestions}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/charts/export/{chart_id}")
 async def export_chart(chart_id: str, format: str = "png"):
     """Export chart as image"""
+    if format not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Allowed: {sorted(MEDIA_TYPES)}"
+        )
     try:
+        spec = chart_renderer.get_spec(chart_id)
+        if spec is not None:
+            # Re-preparing checks the data version; unchanged data hits both caches
+            prepared = await executor.run_io(chart_pipeline.prepare, **spec)
+            image_path = await chart_renderer.render(chart_id, prepared, format)
+            return FileResponse(
+                path=image_path,
+                media_type=MEDIA_TYPES[format]
+            )
+        
         image_data = await chart_service.export_chart(chart_id, format)
         return StreamingResponse(
             image_data,
-            media_type=f"image/{format}"
+            media_type=MEDIA_TYPES[format]
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -420,16 +904,52 @@ async def list_templates():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_template(template_name: str, filename: str, parameters: Dict[str, Any]):
+    """Apply a template under the file's write lock and refresh its profile"""
+    async with backups.writing(filename):
+        if template_engine.has(template_name):
+            # Compiled templates render off the service; the write itself goes through it
+            contents, result = await executor.run_io(template_engine.apply, template_name, filename, parameters)
+            await executor.run_service(excel_service.save_uploaded_file, result["filename"], contents)
+        else:
+            result = await executor.run_service(template_service.apply_template, template_name, filename, parameters)
+    column_profiler.schedule(filename)
+    retrieval_index.schedule(filename)
+    return result
+
 @app.post("/api/templates/apply")
 async def apply_template(request: TemplateRequest):
     """Apply a template to create/modify Excel file"""
     try:
-        result = await template_service.apply_template(
-            request.template_name,
-            request.filename,
-            request.parameters
-        )
+        result = await run_template(request.template_name, request.filename, request.parameters)
         return {"success": True, "result": result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/templates/apply-bulk")
+async def apply_template_bulk(request: BulkTemplateRequest):
+    """Apply one template to many parameter sets in a single pass"""
+    try:
+        plan = await executor.run_io(template_engine.get, request.template_name)
+        results = []
+        async with backups.writing_many([job.filename for job in request.jobs]):
+            for job in request.jobs:
+                try:
+                    contents, result = await executor.run_io(template_engine.render, plan, job.filename, job.parameters)
+                    await executor.run_service(excel_service.save_uploaded_file, result["filename"], contents)
+                    results.append({"success": True, **result})
+                except Exception as e:
+                    logger.error(f"Template {request.template_name} failed for {job.filename}: {e}")
+                    results.append({"success": False, "filename": job.filename, "error": str(e)})
+        for result in results:
+            if result["success"]:
+                column_profiler.schedule(result["filename"])
+                retrieval_index.schedule(result["filename"])
+        return {"success": True, "results": results}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -442,10 +962,20 @@ async def execute_batch(request: BatchOperationRequest):
         raise HTTPException(status_code=403, detail="Batch operations disabled")
     
     try:
-        results = await excel_service.execute_batch(
-            request.operations,
-            request.parallel
-        )
+        modified = [
+            op.get("filename") if isinstance(op, dict) else getattr(op, "filename", None)
+            for op in request.operations
+            if (op.get("operation") if isinstance(op, dict) else getattr(op, "operation", None)) != "read"
+        ]
+        async with backups.writing_many([name for name in modified if name]):
+            results = await executor.run_service(
+                excel_service.execute_batch,
+                request.operations,
+                request.parallel
+            )
+        for name in set(filter(None, modified)):
+            column_profiler.schedule(name)
+            retrieval_index.schedule(name)
         return {"success": True, "results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -456,7 +986,7 @@ async def execute_batch(request: BatchOperationRequest):
 async def get_history(filename: str, limit: int = 50):
     """Get operation history for a file"""
     try:
-        history = await excel_service.get_history(filename, limit)
+        history = await executor.run_service(excel_service.get_history, filename, limit)
         return OperationHistoryResponse(success=True, history=history)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -465,7 +995,10 @@ async def get_history(filename: str, limit: int = 50):
 async def undo_operation(filename: str, operation_id: str):
     """Undo a specific operation"""
     try:
-        result = await excel_service.undo_operation(filename, operation_id)
+        async with backups.writing(filename):
+            result = await executor.run_service(excel_service.undo_operation, filename, operation_id)
+        column_profiler.schedule(filename)
+        retrieval_index.schedule(filename)
         
         # Notify clients
         await ws_manager.broadcast({
@@ -483,8 +1016,8 @@ async def undo_operation(filename: str, operation_id: str):
 async def list_backups(filename: str):
     """List all backups for a file"""
     try:
-        backups = await excel_service.list_backups(filename)
-        return {"success": True, "backups": backups}
+        # Snapshots and the imported service backups, newest first, without a directory scan
+        return {"success": True, "backups": backups.list(filename)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -492,7 +1025,17 @@ async def list_backups(filename: str):
 async def restore_backup(filename: str, backup_id: str):
     """Restore from a backup"""
     try:
-        result = await excel_service.restore_backup(filename, backup_id)
+        entry = backups.find(filename, backup_id)
+        if entry is not None and entry["method"] != "legacy":
+            result = await backups.restore(
+                filename, backup_id,
+                lambda name, contents: executor.run_service(excel_service.save_uploaded_file, name, contents)
+            )
+        else:
+            async with backups.writing(filename):
+                result = await executor.run_service(excel_service.restore_backup, filename, backup_id)
+        column_profiler.schedule(filename)
+        retrieval_index.schedule(filename)
         return {"success": True, "result": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -500,34 +1043,178 @@ async def restore_backup(filename: str, backup_id: str):
 # ── Export Endpoints ───────────────────────────────────────────────────
 
 @app.post("/api/export/pdf")
-async def export_pdf(filename: str, sheet_name: Optional[str] = None):
+async def export_pdf(request: Request, filename: str, sheet_name: Optional[str] = None):
     """Export Excel to PDF"""
     if not settings.features.enable_export:
         raise HTTPException(status_code=403, detail="Export disabled")
     
     try:
-        pdf_path = await excel_service.export_to_pdf(filename, sheet_name)
-        return FileResponse(
-            path=pdf_path,
-            filename=f"{filename}.pdf",
-            media_type="application/pdf"
-        )
+        # Render in an isolated worker process, or reuse the PDF of this workbook version
+        pdf_path = await pdf_exporter.render(filename, sheet_name)
+        return file_response(request, pdf_path, f"{filename}.pdf", "application/pdf")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/export/csv")
-async def export_csv(filename: str, sheet_name: str):
+async def export_csv(request: Request, filename: str, sheet_name: str):
     """Export sheet to CSV"""
     try:
-        csv_path = await excel_service.export_to_csv(filename, sheet_name)
-        return FileResponse(
-            path=csv_path,
-            filename=f"{sheet_name}.csv",
-            media_type="text/csv"
-        )
+        # The CSV is regenerated per request, so validate against the source workbook
+        headers = validators(Path(settings.excel.directory) / Path(filename).name, "csv", sheet_name)
+        conditional = conditional_response(request, headers)
+        if conditional is not None:
+            return conditional
+        
+        csv_path = await executor.run_service(excel_service.export_to_csv, filename, sheet_name)
+        return file_response(request, csv_path, f"{sheet_name}.csv", "text/csv", headers)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ── Scheduler Endpoints ────────────────────────────────────────────────
+
+DEFAULT_SUMMARY_PROMPT = "Summarize the key figures and notable changes in these workbooks."
+
+async def scheduled_template(params: Dict[str, Any]):
+    filename = params["filename"]
+    result = await run_template(params["template_name"], filename, params.get("parameters", {}))
+    await ws_manager.broadcast({
+        "type": "file_updated",
+        "filename": filename,
+        "operation": "scheduled_template"
+    })
+    return result
+
+async def scheduled_export_pdf(params: Dict[str, Any]):
+    path = await pdf_exporter.render(params["filename"], params.get("sheet_name"))
+    return {"path": str(path)}
+
+async def scheduled_export_csv(params: Dict[str, Any]):
+    path = await executor.run_service(excel_service.export_to_csv, params["filename"], params["sheet_name"])
+    return {"path": str(path)}
+
+async def scheduled_query(params: Dict[str, Any]):
+    # Also warms the response cache, so dashboards polling the same query get a HIT
+    request = QueryRequest(**params)
+    headers = query_validators(request)
+    result = await executor.run_io(query_engine.execute, request)
+    await executor.run_io(
+        response_cache.store, headers["ETag"], {"success": True, "data": {**result, "cached": True}}
+    )
+    return result
+
+async def scheduled_summary(params: Dict[str, Any]):
+    files = params.get("files", [])
+    message = params.get("message", DEFAULT_SUMMARY_PROMPT)
+    context = await chat_context(params.get("context"), files, message)
+    with span("ollama.chat"):
+        return await ollama_service.chat(message, context, files)
+
+scheduler.register_action("template", scheduled_template)
+scheduler.register_action("export_pdf", scheduled_export_pdf)
+scheduler.register_action("export_csv", scheduled_export_csv)
+scheduler.register_action("query", scheduled_query)
+scheduler.register_action("summary", scheduled_summary)
+
+def require_scheduler():
+    if not settings.features.enable_scheduler:
+        raise HTTPException(status_code=403, detail="Scheduler disabled")
+
+@app.get("/api/scheduler/jobs", dependencies=[Depends(require_scheduler)])
+async def list_scheduled_jobs():
+    """List scheduled jobs with their next run time and last outcome"""
+    return {"success": True, "jobs": scheduler.list()}
+
+@app.post("/api/scheduler/jobs", dependencies=[Depends(require_scheduler)])
+async def create_scheduled_job(request: ScheduledJobRequest):
+    """Create a recurring job"""
+    try:
+        job = scheduler.add(request)
+        return {"success": True, "job": scheduler.describe(job)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.put("/api/scheduler/jobs/{job_id}", dependencies=[Depends(require_scheduler)])
+async def update_scheduled_job(job_id: str, request: ScheduledJobRequest):
+    """Replace a job's schedule, action or parameters"""
+    try:
+        job = scheduler.update(job_id, request)
+        return {"success": True, "job": scheduler.describe(job)}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/api/scheduler/jobs/{job_id}", dependencies=[Depends(require_scheduler)])
+async def delete_scheduled_job(job_id: str):
+    """Delete a job and its stored result"""
+    try:
+        scheduler.remove(job_id)
+        return {"success": True, "message": f"Job {job_id} deleted"}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@app.post("/api/scheduler/jobs/{job_id}/run", dependencies=[Depends(require_scheduler)])
+async def run_scheduled_job(job_id: str):
+    """Run a job now and wait for it to finish"""
+    try:
+        job = await scheduler.run_job(job_id)
+        return {"success": job.last_status == "success", "job": scheduler.describe(job)}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/scheduler/jobs/{job_id}/result", dependencies=[Depends(require_scheduler)])
+async def get_scheduled_result(job_id: str):
+    """Latest precomputed result of a job"""
+    try:
+        result = await executor.run_io(scheduler.get_result, job_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if result is None:
+        raise HTTPException(status_code=404, detail="Job has not produced a result yet")
+    return {"success": True, **result}
+
+# ── Debug Endpoints ────────────────────────────────────────────────────
+
+profile_lock = asyncio.Lock()
+
+def require_debug_endpoints():
+    if not settings.logging.enable_debug_endpoints:
+        raise HTTPException(status_code=403, detail="Debug endpoints disabled")
+
+@app.post("/debug/tracing", dependencies=[Depends(require_debug_endpoints)])
+async def set_tracing(enabled: bool):
+    """Turn request tracing on or off at runtime"""
+    tracer.enabled = enabled
+    return {"success": True, "tracing": tracer.enabled}
+
+@app.get("/debug/traces", dependencies=[Depends(require_debug_endpoints)])
+async def get_traces(limit: int = 20, path: Optional[str] = None):
+    """Recent request traces with per-stage spans"""
+    return {"success": True, "tracing": tracer.enabled, "traces": tracer.recent(limit, path)}
+
+@app.get("/debug/startup", dependencies=[Depends(require_debug_endpoints)])
+async def get_startup_profile():
+    """Where cold-start and lazy initialization time went"""
+    return {"success": True, "startup": startup_profile.to_dict()}
+
+@app.get("/debug/profile", dependencies=[Depends(require_debug_endpoints)])
+async def profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample all thread stacks for N seconds; returns collapsed stacks for flamegraph tools"""
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    async with profile_lock:
+        collapsed = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    return PlainTextResponse(collapsed)
+
 # ── Error Handlers ─────────────────────────────────────────────────────
 
 @app.exception_handler(404)
@@ -0,0 +1,251 @@
+"""
+Prometheus-style metrics for Ollama Excel Studio
+A small in-process registry rendered in the text exposition format at /metrics
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """Return the child metric for a label combination"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _default(self):
+        return self.labels()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._samples()
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        """Set the value (gauges only; counters only ever go up)"""
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def set(self, value: float):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            inf = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {child.count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and scrape-time collectors"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Register a callback that refreshes gauges right before each scrape"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                continue
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Optional[Sequence[float]] = None) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+
+# ── Application metrics ────────────────────────────────────────────────
+
+REQUEST_LATENCY = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"]
+)
+OLLAMA_TTFT = histogram(
+    "ollama_time_to_first_token_seconds", "Time from chat request to first streamed chunk",
+    ["endpoint"]
+)
+OLLAMA_CHUNKS_PER_SECOND = histogram(
+    "ollama_chunks_per_second", "Streamed chunks per second after the first chunk",
+    ["endpoint"], buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+)
+OLLAMA_REQUEST_LATENCY = histogram(
+    "ollama_request_duration_seconds", "Total Ollama request duration", ["endpoint"]
+)
+BLOCKING_CALL_LATENCY = histogram(
+    "blocking_call_duration_seconds", "Off-loop call duration (Excel parse/save and engines)",
+    ["pool", "operation"]
+)
+WS_BROADCAST_LATENCY = histogram(
+    "websocket_broadcast_duration_seconds", "Time to fan a message out to all clients"
+)
+WS_BROADCAST_RECIPIENTS = histogram(
+    "websocket_broadcast_recipients", "Clients reached per broadcast",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250)
+)
+WS_ACTIVE_CONNECTIONS = gauge("websocket_active_connections", "Open WebSocket connections")
+WS_MESSAGES_SENT = counter(
+    "websocket_messages_sent_total", "Messages sent by the WebSocket manager"
+)
+CACHE_HITS = counter("cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = counter("cache_misses_total", "Cache misses", ["cache"])
+CACHE_ENTRIES = gauge("cache_entries", "Entries currently cached", ["cache"])
+QUEUE_DEPTH = gauge("queue_depth", "Work waiting or running on a pool", ["queue"])
+EVENT_LOOP_LAG = gauge("event_loop_lag_seconds", "Most recent event loop lag sample")
+
+
+_cache_seen: Dict[Tuple[str, str], float] = {}
+
+
+def _advance(metric: Counter, name: str, total: float):
+    """Add a cache's growth since the last scrape; a reset cache counts from zero again"""
+    key = (metric.name, name)
+    last = _cache_seen.get(key, 0.0)
+    _cache_seen[key] = total
+    metric.labels(cache=name).inc(total - last if total >= last else total)
+
+
+def record_cache(name: str, stats: Dict[str, float]):
+    """Fold a cache's get_stats() into the cache metrics"""
+    _advance(CACHE_HITS, name, stats.get("hits", 0))
+    _advance(CACHE_MISSES, name, stats.get("misses", 0))
+    CACHE_ENTRIES.labels(cache=name).set(stats.get("entries", 0))
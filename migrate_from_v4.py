@@ -6,16 +6,113 @@ Safely migrates data, config, and backups to the new Studio
 import os
 import sys
 import json
+import time
 import shutil
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
+COPY_CHUNK = 4 * 1024 * 1024
+MANIFEST_SAVE_EVERY = 500
+
+
+def sha256_file(path):
+    """Hash a file in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(COPY_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_with_checksum(src, dst):
+    """Copy src to dst through a temp file, hashing while copying; returns the checksum
+
+    The temp file is fsynced before it replaces dst, so a crash never leaves a
+    truncated file under the final name.
+    """
+    digest = hashlib.sha256()
+    tmp = dst.with_name(f".{dst.name}.migrating")
+    try:
+        with open(src, 'rb') as fin, open(tmp, 'wb') as fout:
+            while True:
+                chunk = fin.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                fout.write(chunk)
+            fout.flush()
+            os.fsync(fout.fileno())
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Record of migrated files so an interrupted migration can resume"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+    
+    def is_current(self, src, dst):
+        """True if dst was verified from this exact version of src"""
+        entry = self.entries.get(str(dst))
+        if entry is None or not dst.exists():
+            return False
+        stat = src.stat()
+        return (
+            entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and dst.stat().st_size == stat.st_size
+        )
+    
+    def record(self, src, dst, checksum):
+        stat = src.stat()
+        with self._lock:
+            self.entries[str(dst)] = {
+                "source": str(src),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": checksum
+            }
+    
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.entries, indent=1)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+
 
 class Migration:
-    def __init__(self, v4_path, v5_path):
+    def __init__(self, v4_path, v5_path, workers=None, assume_yes=False, verify_existing=False):
         self.v4_path = Path(v4_path)
         self.v5_path = Path(v5_path)
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.assume_yes = assume_yes
+        self.verify_existing = verify_existing
+        self.manifest = Manifest(self.v5_path / "data" / ".migration-manifest.json")
         self.log = []
+        self.failed = 0
         
     def print_log(self, message, level="INFO"):
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -50,6 +147,62 @@ class Migration:
         self.print_log("v4.1 installation verified", "SUCCESS")
         return True
     
+    def _copy_one(self, src, dst):
+        """Copy one file unless it is already migrated; returns (bytes copied, skipped)"""
+        if self.manifest.is_current(src, dst):
+            if not self.verify_existing or sha256_file(dst) == self.manifest.entries[str(dst)]["sha256"]:
+                return 0, True
+        elif dst.exists() and dst.stat().st_size == src.stat().st_size:
+            # Copied by an earlier run without a manifest entry; adopt it if identical
+            checksum = sha256_file(src)
+            if sha256_file(dst) == checksum:
+                self.manifest.record(src, dst, checksum)
+                return 0, True
+        
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        checksum = copy_with_checksum(src, dst)
+        self.manifest.record(src, dst, checksum)
+        return src.stat().st_size, False
+    
+    def copy_files(self, pairs, label, log_each=False):
+        """Copy (src, dst) pairs on a thread pool with resume, verification and throughput stats"""
+        started = time.perf_counter()
+        copied = skipped = failed = 0
+        total_bytes = 0
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._copy_one, src, dst): src for src, dst in pairs}
+            for done, future in enumerate(as_completed(futures), 1):
+                src = futures[future]
+                try:
+                    size, was_skipped = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.print_log(f"  Failed: {src.name}: {e}", "ERROR")
+                    continue
+                
+                if was_skipped:
+                    skipped += 1
+                else:
+                    copied += 1
+                    total_bytes += size
+                    if log_each:
+                        self.print_log(f"  Copied: {src.name}")
+                
+                if done % MANIFEST_SAVE_EVERY == 0:
+                    self.manifest.save()
+                    self.print_log(f"  {label}: {done}/{len(futures)} files")
+        
+        self.manifest.save()
+        self.failed += failed
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.print_log(
+            f"  {label}: {copied} copied, {skipped} already migrated, {failed} failed; "
+            f"{total_bytes / 1048576:.1f} MB in {elapsed:.1f}s "
+            f"({total_bytes / 1048576 / elapsed:.1f} MB/s, {(copied + skipped) / elapsed:.0f} files/s)"
+        )
+        return copied + skipped, failed
+    
     def migrate_excel_files(self):
         """Copy Excel files and backups"""
         self.print_log("Migrating Excel files...")
@@ -61,12 +214,10 @@ class Migration:
         if v4_excel.exists():
             files = list(v4_excel.glob("*.xlsx")) + list(v4_excel.glob("*.xls"))
             if files:
-                v5_excel.mkdir(parents=True, exist_ok=True)
-                for file in files:
-                    if file.name != ".gitkeep":
-                        shutil.copy2(file, v5_excel / file.name)
-                        self.print_log(f"  Copied: {file.name}")
-                self.print_log(f"Migrated {len(files)} Excel files", "SUCCESS")
+                migrated, failed = self.copy_files(
+                    [(file, v5_excel / file.name) for file in files], "Excel files", log_each=True
+                )
+                self.print_log(f"Migrated {migrated} Excel files", "ERROR" if failed else "SUCCESS")
             else:
                 self.print_log("No Excel files to migrate", "WARNING")
         else:
@@ -79,12 +230,10 @@ class Migration:
         if v4_backups.exists():
             backups = list(v4_backups.glob("*.xlsx")) + list(v4_backups.glob("*.xls"))
             if backups:
-                v5_backups.mkdir(parents=True, exist_ok=True)
-                for backup in backups:
-                    if backup.name != ".gitkeep":
-                        shutil.copy2(backup, v5_backups / backup.name)
-                self.print_log(f"  Copied backup: {backup.name}")
-                self.print_log(f"Migrated {len(backups)} backup files", "SUCCESS")
+                migrated, failed = self.copy_files(
+                    [(backup, v5_backups / backup.name) for backup in backups], "Backups"
+                )
+                self.print_log(f"Migrated {migrated} backup files", "ERROR" if failed else "SUCCESS")
             else:
                 self.print_log("No backups to migrate", "WARNING")
         else:
@@ -193,24 +342,22 @@ class Migration:
         
         v5_mcp.mkdir(parents=True, exist_ok=True)
         
-        # Copy scripts
+        # Scripts, index.js and requirements, copied in one parallel pass
+        pairs = []
         if (v4_mcp / "scripts").exists():
-            shutil.copytree(
-                v4_mcp / "scripts",
-                v5_mcp / "scripts",
-                dirs_exist_ok=True
-            )
-            self.print_log("  MCP scripts copied", "SUCCESS")
-        
-        # Copy index.js if exists
-        if (v4_mcp / "index.js").exists():
-            shutil.copy2(v4_mcp / "index.js", v5_mcp / "index.js")
-            self.print_log("  MCP server index.js copied", "SUCCESS")
-        
-        # Copy requirements if exists
-        if (v4_mcp / "requirements.txt").exists():
-            shutil.copy2(v4_mcp / "requirements.txt", v5_mcp / "requirements.txt")
-            self.print_log("  Python requirements copied", "SUCCESS")
+            pairs += [
+                (path, v5_mcp / path.relative_to(v4_mcp))
+                for path in (v4_mcp / "scripts").rglob("*") if path.is_file()
+            ]
+        for name in ["index.js", "requirements.txt"]:
+            if (v4_mcp / name).exists():
+                pairs.append((v4_mcp / name, v5_mcp / name))
+        
+        if pairs:
+            _, failed = self.copy_files(pairs, "MCP server")
+            if failed:
+                self.print_log(f"  {failed} MCP files failed to copy", "ERROR")
+                return
         
         self.print_log("MCP server migrated (v4.1 is compatible!)", "SUCCESS")
     
@@ -261,10 +408,11 @@ class Migration:
         print(f"Target (v5.0): {self.v5_path}\n")
         
         # Confirm
-        response = input("Proceed with migration? [Y/n]: ")
-        if response.lower() in ['n', 'no']:
-            print("\nMigration cancelled.")
-            return False
+        if not self.assume_yes:
+            response = input("Proceed with migration? [Y/n]: ")
+            if response.lower() in ['n', 'no']:
+                print("\nMigration cancelled.")
+                return False
         
         print("\n" + "-" * 60 + "\n")
         
@@ -279,6 +427,14 @@ class Migration:
         # Generate report
         self.create_migration_report()
         
+        if self.failed:
+            print("\n" + "=" * 60)
+            print(f"  Migration incomplete: {self.failed} files failed to copy")
+            print("=" * 60)
+            print("\nSee MIGRATION_REPORT.txt for details. Re-running resumes where")
+            print("this run stopped; files already verified are skipped.\n")
+            return False
+        
         print("\n" + "=" * 60)
         print("  Migration Complete! 🎉")
         print("=" * 60)
@@ -293,17 +449,26 @@ class Migration:
 
 
 if __name__ == "__main__":
-    # Default paths
-    v4_path = "../project"  # Assuming v4.1 is in ../project
-    v5_path = "."  # Current directory (v5.0)
-    
-    # Allow custom paths via args
-    if len(sys.argv) > 1:
-        v4_path = sys.argv[1]
-    if len(sys.argv) > 2:
-        v5_path = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Migrate an Ollama-MCP Excel v4.1 install to v5.0")
+    parser.add_argument("v4_path", nargs="?", default="../project",
+                        help="v4.1 installation (default: ../project)")
+    parser.add_argument("v5_path", nargs="?", default=".",
+                        help="v5.0 installation (default: current directory)")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="Don't prompt for confirmation (for scripts)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel copy threads (default: 4 per CPU, max 32)")
+    parser.add_argument("--verify-existing", action="store_true",
+                        help="Re-hash files the manifest says are already migrated")
+    args = parser.parse_args()
     
-    migration = Migration(v4_path, v5_path)
+    migration = Migration(
+        args.v4_path,
+        args.v5_path,
+        workers=args.workers,
+        assume_yes=args.yes,
+        verify_existing=args.verify_existing
+    )
     success = migration.run()
     
     sys.exit(0 if success else 1)
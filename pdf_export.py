@@ -0,0 +1,259 @@
+"""
+PDF export worker pool for Ollama Excel Studio
+Renders run in a small pool of persistent spawned worker processes under a
+concurrency cap, so a crashing or hung renderer cannot take down the API
+process and the renderer is imported once per worker rather than per export.
+A timed-out worker is killed with its whole process group and replaced.
+Output is cached per workbook version; the endpoint serves the finished file
+(the renderer produces a whole document, so there are no pages to stream).
+"""
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Set
+from pathlib import Path
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+
+from core.config import Settings
+from core.cache import file_version
+
+logger = logging.getLogger(__name__)
+
+RENDER_ATTEMPTS = 3
+
+
+def _worker_main(conn: Connection):
+    """Worker process entry point: render jobs received over `conn` until it closes
+
+    The worker reads the saved workbook; the parent checks afterwards that the
+    file did not change during the render (see PDFExporter._run).
+    """
+    # Lead a new process group so a timeout also kills any renderer this starts
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+    from services.excel import ExcelService
+
+    loop = asyncio.new_event_loop()
+    service, service_settings = None, None
+    while True:
+        try:
+            settings, filename, sheet_name, out_path = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if service is None or settings != service_settings:
+                service, service_settings = ExcelService(settings), settings
+            pdf_path = loop.run_until_complete(service.export_to_pdf(filename, sheet_name))
+            shutil.copyfile(pdf_path, out_path)
+            conn.send(None)
+        except Exception as e:
+            conn.send(f"{type(e).__name__}: {e}")
+
+
+def _kill_group(process: multiprocessing.Process):
+    """Kill a worker together with every process in its group"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        process.kill()
+
+
+class _Worker:
+    """One persistent render process and the parent's end of its pipe"""
+
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def render(self, job: tuple, timeout: float) -> Optional[str]:
+        """Send a job and wait for its reply (blocking); None on success, else the error"""
+        self.conn.send(job)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"PDF render exceeded {timeout}s")
+        try:
+            return self.conn.recv()
+        except EOFError:
+            self.process.join(timeout=1)
+            raise RuntimeError(f"PDF render failed (exit code {self.process.exitcode})")
+
+    def stop(self, kill: bool = False):
+        if kill:
+            _kill_group(self.process)
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            _kill_group(self.process)
+            self.process.join()
+
+
+class PDFJob:
+    """A single render in progress, shared by every request for the same version"""
+
+    def __init__(self, key: str, version: str, tmp_path: Path, final_path: Path):
+        self.key = key
+        self.version = version
+        self.tmp_path = tmp_path
+        self.final_path = final_path
+        self.done = asyncio.Event()
+        self.error: Optional[str] = None
+        self.stale = False
+
+
+class PDFExporter:
+    """Renders workbooks to PDF on a pool of isolated worker processes"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: List[_Worker] = []
+        self._workers = 0
+        self._available = asyncio.Event()
+        self._jobs: Dict[str, PDFJob] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def apply_settings(self, settings: Settings):
+        """Resize the pool; surplus workers retire as they become idle"""
+        self.settings = settings
+        while self._idle and self._workers > settings.workers.pdf_processes:
+            self._retire(self._idle.pop())
+        self._available.set()
+
+    @property
+    def output_directory(self) -> Path:
+        return Path(self.settings.cache.directory) / "pdf"
+
+    def _source(self, filename: str) -> Path:
+        return Path(self.settings.excel.directory) / Path(filename).name
+
+    def _prefix(self, filename: str, sheet_name: Optional[str]) -> str:
+        return f"{Path(filename).name}--{sheet_name or '_all'}--"
+
+    def _version(self, filename: str) -> str:
+        source = self._source(filename)
+        if not source.exists():
+            raise FileNotFoundError(filename)
+        return file_version(source)
+
+    def _output_path(self, filename: str, sheet_name: Optional[str], version: str) -> Path:
+        return self.output_directory / f"{self._prefix(filename, sheet_name)}{version}.pdf"
+
+    @property
+    def active_jobs(self) -> int:
+        return len(self._jobs)
+
+    def get_cached(self, filename: str, sheet_name: Optional[str] = None) -> Optional[Path]:
+        """Return the rendered PDF for the current workbook version, if any"""
+        path = self._output_path(filename, sheet_name, self._version(filename))
+        return path if path.exists() else None
+
+    async def _acquire(self) -> _Worker:
+        while True:
+            if self._idle:
+                return self._idle.pop()
+            if self._workers < max(self.settings.workers.pdf_processes, 1):
+                self._workers += 1
+                try:
+                    return await asyncio.to_thread(_Worker, self._ctx)
+                except BaseException:
+                    self._workers -= 1
+                    raise
+            self._available.clear()
+            await self._available.wait()
+
+    def _retire(self, worker: _Worker, kill: bool = False):
+        self._workers -= 1
+        worker.stop(kill)
+
+    def _release(self, worker: _Worker):
+        if self._workers > max(self.settings.workers.pdf_processes, 1):
+            self._retire(worker)
+        else:
+            self._idle.append(worker)
+        self._available.set()
+
+    async def _run(self, job: PDFJob, filename: str, sheet_name: Optional[str]):
+        """Run the render on a worker, enforcing the timeout and publishing the result"""
+        try:
+            worker = await self._acquire()
+            timeout = self.settings.workers.pdf_timeout_seconds
+            request = (self.settings, filename, sheet_name, str(job.tmp_path))
+            try:
+                error = await asyncio.to_thread(worker.render, request, timeout)
+            except BaseException:
+                # Timed out or crashed: kill the worker and its children, a new one takes its place
+                await asyncio.to_thread(self._retire, worker, True)
+                self._available.set()
+                raise
+            self._release(worker)
+            if error is not None:
+                raise RuntimeError(error)
+
+            # Read-after-write check: the worker read the saved file, which must still be this version
+            if self._version(filename) != job.version:
+                job.stale = True
+                raise RuntimeError(f"{filename} changed while it was being rendered")
+            os.replace(job.tmp_path, job.final_path)
+            self._prune(filename, sheet_name, keep=job.final_path)
+        except asyncio.CancelledError:
+            job.error = "PDF export cancelled"
+            job.tmp_path.unlink(missing_ok=True)
+            raise
+        except Exception as e:
+            job.error = str(e)
+            if not job.stale:
+                logger.error(f"PDF export of {filename} failed: {e}")
+            job.tmp_path.unlink(missing_ok=True)
+        finally:
+            job.done.set()
+            self._jobs.pop(job.key, None)
+
+    def _prune(self, filename: str, sheet_name: Optional[str], keep: Path):
+        """Remove PDFs rendered from older versions of the same workbook"""
+        for path in self.output_directory.glob(f"{self._prefix(filename, sheet_name)}*.pdf"):
+            if path != keep:
+                path.unlink(missing_ok=True)
+
+    def _start(self, filename: str, sheet_name: Optional[str]) -> PDFJob:
+        version = self._version(filename)
+        final_path = self._output_path(filename, sheet_name, version)
+        key = final_path.name
+        job = self._jobs.get(key)
+        if job is not None:
+            return job
+
+        self.output_directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = final_path.with_suffix(f".{os.getpid()}.part")
+
+        job = PDFJob(key, version, tmp_path, final_path)
+        self._jobs[key] = job
+        task = asyncio.create_task(self._run(job, filename, sheet_name))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def render(self, filename: str, sheet_name: Optional[str] = None) -> Path:
+        """Render (or join a running render) and wait for the finished PDF"""
+        for _ in range(RENDER_ATTEMPTS):
+            cached = self.get_cached(filename, sheet_name)
+            if cached is not None:
+                return cached
+            job = self._start(filename, sheet_name)
+            await job.done.wait()
+            if job.error is None:
+                return job.final_path
+            if not job.stale:
+                raise RuntimeError(job.error)
+        raise RuntimeError(f"{filename} kept changing while it was being rendered")
+
+    def shutdown(self):
+        """Stop idle workers; busy ones are daemons and end with the API process"""
+        for task in self._tasks:
+            task.cancel()
+        while self._idle:
+            self._retire(self._idle.pop())
@@ -0,0 +1,251 @@
+"""
+Column profiling for Ollama Excel Studio
+Per-sheet column profiles are computed in the background when a file is
+uploaded or written and stored next to the file as metadata, so chart
+suggestions and chat context become lookups
+"""
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.config import Settings
+from core.cache import file_version
+
+logger = logging.getLogger(__name__)
+
+MAX_CATEGORY_CARDINALITY = 20
+MAX_PIE_SLICES = 8
+
+
+def _scalar(value: Any) -> Any:
+    """Make a pandas/numpy scalar JSON-safe"""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def profile_column(series: pd.Series) -> Dict[str, Any]:
+    """Profile a single column: type, cardinality, range and null ratio"""
+    count = len(series)
+    non_null = series.dropna()
+    profile: Dict[str, Any] = {
+        "count": count,
+        "null_ratio": round(1 - len(non_null) / count, 4) if count else 0.0,
+        "cardinality": int(non_null.nunique())
+    }
+
+    if pd.api.types.is_bool_dtype(series):
+        profile["type"] = "boolean"
+    elif pd.api.types.is_numeric_dtype(series):
+        profile["type"] = "numeric"
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        profile["type"] = "datetime"
+    elif profile["cardinality"] <= MAX_CATEGORY_CARDINALITY:
+        profile["type"] = "categorical"
+    else:
+        profile["type"] = "text"
+
+    if profile["type"] in ("numeric", "datetime") and len(non_null):
+        profile["min"] = _scalar(non_null.min())
+        profile["max"] = _scalar(non_null.max())
+        if profile["type"] == "numeric":
+            profile["mean"] = _scalar(non_null.mean())
+    elif profile["type"] == "categorical":
+        profile["top_values"] = [str(v) for v in non_null.value_counts().index[:5]]
+
+    return profile
+
+
+def profile_frame(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Profile every column of a sheet"""
+    return {
+        "rows": len(frame),
+        "columns": {str(name): profile_column(frame[name]) for name in frame.columns}
+    }
+
+
+def suggest_from_profile(sheet_name: str, sheet: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rule-based chart suggestions from a sheet profile"""
+    columns = sheet.get("columns", {})
+    by_type: Dict[str, List[str]] = {}
+    for name, profile in columns.items():
+        by_type.setdefault(profile["type"], []).append(name)
+
+    numeric = by_type.get("numeric", [])
+    suggestions = []
+
+    for date_col in by_type.get("datetime", [])[:1]:
+        for value_col in numeric[:3]:
+            suggestions.append({
+                "chart_type": "line",
+                "sheet_name": sheet_name,
+                "options": {"x": date_col, "y": value_col},
+                "reason": f"{value_col} over time ({date_col})"
+            })
+
+    for category_col in by_type.get("categorical", [])[:2]:
+        cardinality = columns[category_col]["cardinality"]
+        for value_col in numeric[:2]:
+            suggestions.append({
+                "chart_type": "pie" if cardinality <= MAX_PIE_SLICES else "bar",
+                "sheet_name": sheet_name,
+                "options": {"x": category_col, "y": value_col},
+                "reason": f"{value_col} by {category_col} ({cardinality} categories)"
+            })
+
+    if len(numeric) >= 2:
+        suggestions.append({
+            "chart_type": "scatter",
+            "sheet_name": sheet_name,
+            "options": {"x": numeric[0], "y": numeric[1]},
+            "reason": f"Relationship between {numeric[0]} and {numeric[1]}"
+        })
+
+    for value_col in numeric[:2]:
+        suggestions.append({
+            "chart_type": "histogram",
+            "sheet_name": sheet_name,
+            "options": {"x": value_col},
+            "reason": f"Distribution of {value_col}"
+        })
+
+    return suggestions
+
+
+class ColumnProfiler:
+    """Computes and stores per-sheet column profiles alongside workbooks"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._dirty: set = set()
+
+    @property
+    def metadata_directory(self) -> Path:
+        return Path(self.settings.excel.directory) / ".metadata"
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def _file_path(self, filename: str) -> Path:
+        return Path(self.settings.excel.directory) / Path(filename).name
+
+    def _metadata_path(self, filename: str) -> Path:
+        return self.metadata_directory / f"{Path(filename).name}.profile.json"
+
+    def compute(self, filename: str) -> Dict[str, Any]:
+        """Profile all sheets of a file and persist the result"""
+        path = self._file_path(filename)
+        version = file_version(path)
+
+        if path.suffix.lower() == ".csv":
+            sheets = {path.stem: pd.read_csv(path)}
+        else:
+            sheets = pd.read_excel(path, sheet_name=None)
+
+        profiles = {
+            "filename": path.name,
+            "version": version,
+            "sheets": {str(name): profile_frame(frame) for name, frame in sheets.items()}
+        }
+
+        meta_path = self._metadata_path(filename)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(profiles, f, default=str)
+        os.replace(tmp_path, meta_path)
+
+        return profiles
+
+    def _read(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Return stored profiles if they match the current file version (blocking)"""
+        path = self._file_path(filename)
+        meta_path = self._metadata_path(filename)
+        if not path.exists() or not meta_path.exists():
+            return None
+
+        try:
+            with open(meta_path, "r") as f:
+                profiles = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if profiles.get("version") != file_version(path):
+            return None
+        return profiles
+
+    async def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Stored profiles for the current file version, read off the event loop"""
+        return await asyncio.to_thread(self._read, filename)
+
+    def schedule(self, filename: str):
+        """Recompute profiles in the background; coalesces bursts of writes"""
+        name = Path(filename).name
+        if name in self._tasks:
+            self._dirty.add(name)
+            return
+        self._tasks[name] = asyncio.create_task(self._run(name))
+
+    async def _run(self, name: str):
+        try:
+            while True:
+                self._dirty.discard(name)
+                try:
+                    await asyncio.to_thread(self.compute, name)
+                except FileNotFoundError:
+                    return
+                except Exception as e:
+                    logger.warning(f"Profiling {name} failed: {e}")
+                    return
+                if name not in self._dirty:
+                    return
+        finally:
+            self._tasks.pop(name, None)
+
+    def remove(self, filename: str):
+        """Delete stored profiles for a file"""
+        try:
+            self._metadata_path(filename).unlink()
+        except FileNotFoundError:
+            pass
+
+    async def suggest(self, filename: str, sheet_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Chart suggestions from stored profiles, profiling the file now if they are not ready"""
+        profiles = await self.get(filename)
+        if profiles is None:
+            if not self._file_path(filename).exists():
+                raise FileNotFoundError(filename)
+            profiles = await asyncio.to_thread(self.compute, filename)
+
+        suggestions = []
+        for name, sheet in profiles["sheets"].items():
+            if sheet_name is None or name == sheet_name:
+                suggestions.extend(suggest_from_profile(name, sheet))
+        return suggestions
+
+    async def summarize(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Compact per-sheet column summary for the chat context"""
+        profiles = await self.get(filename)
+        if profiles is None:
+            return None
+
+        return {
+            name: {
+                "rows": sheet["rows"],
+                "columns": {
+                    col: {k: v for k, v in profile.items() if k in ("type", "min", "max", "cardinality")}
+                    for col, profile in sheet["columns"].items()
+                }
+            }
+            for name, sheet in profiles["sheets"].items()
+        }
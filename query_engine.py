@@ -0,0 +1,295 @@
+"""
+Vectorized query engine for Ollama Excel Studio
+Loads sheet ranges into pandas columns and runs filter/group/aggregate/pivot
+operations without row-by-row Python
+"""
+from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import re
+import logging
+
+from core.config import Settings
+from core.cache import VersionedCache, file_version
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from core.executor import BlockingExecutor
+
+logger = logging.getLogger(__name__)
+
+_CELL_RE = re.compile(r"^\$?([A-Za-z]{1,3})\$?(\d+)$")
+
+FILTER_OPS = {"==", "!=", ">", ">=", "<", "<=", "in", "not_in", "contains", "isnull", "notnull"}
+AGGREGATE_FUNCS = {"sum", "mean", "min", "max", "count", "nunique", "median", "std"}
+
+
+class QueryFilter(BaseModel):
+    """A single column predicate"""
+    column: str
+    op: str = "=="
+    value: Any = None
+
+
+class QueryAggregate(BaseModel):
+    """An aggregate over one column"""
+    column: str
+    func: str = "sum"
+    alias: Optional[str] = None
+
+
+class QueryPivot(BaseModel):
+    """Pivot table specification"""
+    index: List[str]
+    columns: List[str]
+    values: str
+    func: str = "sum"
+
+
+class QueryRequest(BaseModel):
+    """Request body for /api/excel/query"""
+    filename: str
+    sheet_name: Optional[str] = None
+    range: Optional[str] = None
+    filters: List[QueryFilter] = Field(default_factory=list)
+    group_by: List[str] = Field(default_factory=list)
+    aggregates: List[QueryAggregate] = Field(default_factory=list)
+    pivot: Optional[QueryPivot] = None
+    sort_by: Optional[str] = None
+    descending: bool = False
+    limit: Optional[int] = 1000
+
+
+def parse_range(cell_range: str) -> Tuple[str, int, str, int]:
+    """Split an A1-style range like "A1:D100" into (first_col, first_row, last_col, last_row)"""
+    parts = cell_range.split(":")
+    if len(parts) != 2:
+        raise ValueError(f"Invalid range: {cell_range}")
+
+    matches = [_CELL_RE.match(part.strip()) for part in parts]
+    if not all(matches):
+        raise ValueError(f"Invalid range: {cell_range}")
+
+    (first_col, first_row), (last_col, last_row) = [m.groups() for m in matches]
+    return first_col.upper(), int(first_row), last_col.upper(), int(last_row)
+
+
+def column_number(letters: str) -> int:
+    """1-based index of a column given by its letters, e.g. A -> 1, AB -> 28"""
+    number = 0
+    for letter in letters.upper():
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number
+
+
+def read_frame(path: Path, sheet_name: Optional[str], cell_range: Optional[str]) -> "pd.DataFrame":
+    """Read a sheet (or range) into a DataFrame with the first row as header
+
+    Stateless and picklable, so parsing can run on the executor's process pool.
+    """
+    import pandas as pd
+
+    read_kwargs: Dict[str, Any] = {}
+    if cell_range:
+        first_col, first_row, last_col, last_row = parse_range(cell_range)
+        read_kwargs = {
+            "usecols": f"{first_col}:{last_col}",
+            "skiprows": first_row - 1,
+            "nrows": max(last_row - first_row, 0)
+        }
+
+    if path.suffix.lower() == ".csv":
+        if cell_range:
+            # read_csv takes column positions, not letter ranges
+            first, last = column_number(first_col), column_number(last_col)
+            read_kwargs["usecols"] = list(range(first - 1, last))
+        return pd.read_csv(path, **read_kwargs)
+
+    return pd.read_excel(path, sheet_name=sheet_name or 0, **read_kwargs)
+
+
+class QueryEngine:
+    """Runs vectorized queries over workbook data, cached per sheet version"""
+
+    def __init__(self, settings: Settings, executor: Optional["BlockingExecutor"] = None,
+                 max_frames: int = 8, max_results: int = 256):
+        self.settings = settings
+        self.executor = executor
+        self.frames = VersionedCache(max_frames)
+        self.results = VersionedCache(max_results)
+
+    def _resolve_path(self, filename: str) -> Path:
+        path = Path(self.settings.excel.directory) / Path(filename).name
+        if not path.exists():
+            raise FileNotFoundError(filename)
+        return path
+
+    def _read_frame(self, path: Path, sheet_name: Optional[str], cell_range: Optional[str]) -> "pd.DataFrame":
+        """Parse on the process pool when an executor is available (callers are on I/O threads)"""
+        if self.executor is None:
+            return read_frame(path, sheet_name, cell_range)
+        return self.executor.call_cpu(read_frame, path, sheet_name, cell_range)
+
+    def load_frame(self, filename: str, sheet_name: Optional[str] = None,
+                   cell_range: Optional[str] = None) -> Tuple["pd.DataFrame", str]:
+        """Load a range as columns, reusing the parsed frame while the file is unchanged"""
+        path = self._resolve_path(filename)
+        version = file_version(path)
+        key = (path.name, version, sheet_name, cell_range)
+
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self._read_frame(path, sheet_name, cell_range)
+            self.frames.set(key, frame)
+        return frame, version
+
+    @staticmethod
+    def _require_columns(frame: "pd.DataFrame", columns: List[str]):
+        missing = [c for c in columns if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Unknown columns: {missing}")
+
+    @staticmethod
+    def _build_mask(frame: "pd.DataFrame", filters: List[QueryFilter]) -> Optional["pd.Series"]:
+        """Combine all filters into a single boolean mask"""
+        mask = None
+        for f in filters:
+            if f.op not in FILTER_OPS:
+                raise ValueError(f"Unsupported filter op: {f.op}")
+
+            column = frame[f.column]
+            if f.op == "==":
+                cond = column == f.value
+            elif f.op == "!=":
+                cond = column != f.value
+            elif f.op == ">":
+                cond = column > f.value
+            elif f.op == ">=":
+                cond = column >= f.value
+            elif f.op == "<":
+                cond = column < f.value
+            elif f.op == "<=":
+                cond = column <= f.value
+            elif f.op == "in":
+                cond = column.isin(f.value or [])
+            elif f.op == "not_in":
+                cond = ~column.isin(f.value or [])
+            elif f.op == "contains":
+                cond = column.astype(str).str.contains(str(f.value), case=False, regex=False, na=False)
+            elif f.op == "isnull":
+                cond = column.isna()
+            else:
+                cond = column.notna()
+
+            mask = cond if mask is None else mask & cond
+        return mask
+
+    @staticmethod
+    def _aggregate(frame: "pd.DataFrame", group_by: List[str],
+                   aggregates: List[QueryAggregate]) -> "pd.DataFrame":
+        import pandas as pd
+
+        for agg in aggregates:
+            if agg.func not in AGGREGATE_FUNCS:
+                raise ValueError(f"Unsupported aggregate: {agg.func}")
+
+        named = {
+            agg.alias or f"{agg.func}_{agg.column}": pd.NamedAgg(column=agg.column, aggfunc=agg.func)
+            for agg in aggregates
+        }
+
+        if group_by:
+            if not named:
+                return frame.groupby(group_by, dropna=False).size().reset_index(name="count")
+            return frame.groupby(group_by, dropna=False).agg(**named).reset_index()
+
+        return pd.DataFrame([{
+            name: getattr(frame[spec.column], spec.aggfunc)()
+            for name, spec in named.items()
+        }])
+
+    def _run(self, frame: "pd.DataFrame", request: QueryRequest) -> "pd.DataFrame":
+        import pandas as pd
+
+        referenced = [f.column for f in request.filters] + request.group_by
+        referenced += [agg.column for agg in request.aggregates]
+        if request.pivot:
+            referenced += request.pivot.index + request.pivot.columns + [request.pivot.values]
+        self._require_columns(frame, referenced)
+
+        mask = self._build_mask(frame, request.filters)
+        if mask is not None:
+            frame = frame[mask]
+
+        if request.pivot:
+            if request.pivot.func not in AGGREGATE_FUNCS:
+                raise ValueError(f"Unsupported aggregate: {request.pivot.func}")
+            frame = pd.pivot_table(
+                frame,
+                index=request.pivot.index,
+                columns=request.pivot.columns,
+                values=request.pivot.values,
+                aggfunc=request.pivot.func
+            )
+            frame.columns = [
+                "_".join(str(part) for part in col) if isinstance(col, tuple) else str(col)
+                for col in frame.columns
+            ]
+            frame = frame.reset_index()
+        elif request.group_by or request.aggregates:
+            frame = self._aggregate(frame, request.group_by, request.aggregates)
+
+        if request.sort_by:
+            self._require_columns(frame, [request.sort_by])
+            frame = frame.sort_values(request.sort_by, ascending=not request.descending)
+
+        return frame
+
+    @staticmethod
+    def _to_payload(frame: "pd.DataFrame", limit: Optional[int]) -> Dict[str, Any]:
+        """Convert a result frame to JSON-safe columns/rows"""
+        import numpy as np
+        import pandas as pd
+
+        total = len(frame)
+        if limit is not None:
+            frame = frame.head(limit)
+
+        frame = frame.astype(object).where(pd.notna(frame), None)
+        rows = [
+            [value.item() if isinstance(value, np.generic) else value for value in row]
+            for row in frame.itertuples(index=False, name=None)
+        ]
+        return {
+            "columns": [str(c) for c in frame.columns],
+            "rows": rows,
+            "row_count": total,
+            "truncated": limit is not None and total > limit
+        }
+
+    def execute(self, request: QueryRequest) -> Dict[str, Any]:
+        """Execute a query, serving repeated queries on an unchanged sheet from cache"""
+        frame, version = self.load_frame(request.filename, request.sheet_name, request.range)
+
+        key = (Path(request.filename).name, version, request.model_dump_json())
+        cached = self.results.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        result = self._to_payload(self._run(frame, request), request.limit)
+        result["version"] = version
+        self.results.set(key, result)
+        return {**result, "cached": False}
+
+    def invalidate(self, filename: str):
+        """Drop cached frames and results for a file"""
+        name = Path(filename).name
+        self.frames.invalidate(lambda key: key[0] == name)
+        self.results.invalidate(lambda key: key[0] == name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "frames": self.frames.get_stats(),
+            "results": self.results.get_stats()
+        }
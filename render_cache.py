@@ -0,0 +1,369 @@
+"""
+Chart render cache for Ollama Excel Studio
+Rendered chart images are stored on disk under a content hash of the chart
+spec and data version, with LRU eviction and optional process-pool rendering.
+Exports render the figure chart_service built (title, colors, axes, layout)
+with only its trace data swapped for the downsampled series.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+
+from core.config import Settings
+from core.cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+    "pdf": "application/pdf"
+}
+
+
+def render_key(spec: Dict[str, Any], figure: Optional[Dict[str, Any]], version: str,
+               fmt: str, width: int, height: int) -> str:
+    """Content-hash key for a chart spec and figure rendered against a data version at a size"""
+    payload = json.dumps({"spec": spec, "figure": figure, "version": version, "format": fmt,
+                          "width": width, "height": height},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def figure_of(chart: Any) -> Optional[Dict[str, Any]]:
+    """The plotly figure (dict or JSON string) in a chart_service result, if it has one"""
+    if not isinstance(chart, dict):
+        return None
+    for candidate in (chart.get("figure"), chart.get("plotly"), chart):
+        if isinstance(candidate, str):
+            try:
+                candidate = json.loads(candidate)
+            except ValueError:
+                continue
+        if isinstance(candidate, dict) and isinstance(candidate.get("data"), list):
+            return candidate
+    return None
+
+
+def with_series(figure: Dict[str, Any], prepared: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a plotly figure with each trace's data replaced by its reduced series
+
+    Everything else about the traces and the layout is kept as chart_service built it.
+    """
+    traces = [dict(trace) for trace in figure.get("data", [])]
+    for trace, series in zip(traces, prepared.get("series", [])):
+        if "bins" in series:
+            # Plotly would re-bin every raw value; draw the precomputed bins as bars instead
+            edges = series["bins"]
+            for key in ("nbinsx", "nbinsy", "xbins", "ybins", "histfunc", "histnorm", "autobinx"):
+                trace.pop(key, None)
+            trace.update(
+                type="bar",
+                x=[(a + b) / 2 for a, b in zip(edges[:-1], edges[1:])],
+                y=series["counts"],
+                width=[b - a for a, b in zip(edges[:-1], edges[1:])]
+            )
+        elif "labels" in series:
+            if trace.get("type") == "pie":
+                trace.update(labels=series["labels"], values=series["values"])
+            elif trace.get("orientation") == "h":
+                trace.update(x=series["values"], y=series["labels"])
+            else:
+                trace.update(x=series["labels"], y=series["values"])
+        else:
+            trace.update(x=series["x"], y=series["y"])
+    return {**figure, "data": traces}
+
+
+def with_reduced_data(chart: Any, prepared: Dict[str, Any]) -> Any:
+    """Copy of a chart_service result whose figure carries the reduced series
+
+    The figure keeps its encoding (dict or JSON string); results without a
+    plotly figure are returned unchanged.
+    """
+    if not isinstance(chart, dict):
+        return chart
+    for key in ("figure", "plotly"):
+        candidate = chart.get(key)
+        encoded = isinstance(candidate, str)
+        if encoded:
+            try:
+                candidate = json.loads(candidate)
+            except ValueError:
+                continue
+        if isinstance(candidate, dict) and isinstance(candidate.get("data"), list):
+            reduced = with_series(candidate, prepared)
+            return {**chart, key: json.dumps(reduced, default=str) if encoded else reduced}
+    if isinstance(chart.get("data"), list):
+        return with_series(chart, prepared)
+    return chart
+
+
+def render_figure(prepared: Dict[str, Any], fmt: str, width: int, height: int,
+                  figure: Optional[Dict[str, Any]] = None, title: Optional[str] = None) -> bytes:
+    """Render prepared chart series to image bytes (runs in a worker process)
+
+    With `figure` (the chart as chart_service built it) only its data is
+    replaced; without one a plain figure is drawn from the series.
+    """
+    import plotly.graph_objects as go
+
+    if figure is not None:
+        fig = go.Figure(with_series(figure, prepared))
+        return fig.to_image(format=fmt, width=width, height=height)
+
+    chart_type = prepared.get("chart_type", "line")
+    fig = go.Figure()
+    for series in prepared.get("series", []):
+        name = series.get("name")
+        if chart_type == "pie":
+            fig.add_trace(go.Pie(labels=series["labels"], values=series["values"], name=name))
+        elif chart_type == "bar":
+            fig.add_trace(go.Bar(x=series["labels"], y=series["values"], name=name))
+        elif chart_type == "histogram":
+            edges = series["bins"]
+            centers = [(a + b) / 2 for a, b in zip(edges[:-1], edges[1:])]
+            widths = [b - a for a, b in zip(edges[:-1], edges[1:])]
+            fig.add_trace(go.Bar(x=centers, y=series["counts"], width=widths, name=name))
+        elif chart_type == "scatter":
+            fig.add_trace(go.Scattergl(x=series["x"], y=series["y"], mode="markers", name=name))
+        else:
+            fig.add_trace(go.Scatter(
+                x=series["x"], y=series["y"], mode="lines", name=name,
+                fill="tozeroy" if chart_type == "area" else None
+            ))
+
+    if title:
+        fig.update_layout(title=title)
+    return fig.to_image(format=fmt, width=width, height=height)
+
+
+class DiskLRUCache:
+    """Byte blobs on disk, evicted least-recently-used once over a size budget"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+        # Rebuild the index from disk, oldest access first
+        existing = sorted(
+            (p for p in self.directory.iterdir() if p.is_file() and not p.name.endswith(".tmp")),
+            key=lambda p: p.stat().st_mtime
+        )
+        for path in existing:
+            size = path.stat().st_size
+            self._entries[path.name] = size
+            self._size += size
+
+    def get(self, name: str) -> Optional[Path]:
+        """Return the cached file path, marking it as recently used"""
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+
+        path = self.directory / name
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._size -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def set(self, name: str, data: bytes) -> Path:
+        """Atomically write a blob and evict old entries over the size budget"""
+        path = self.directory / name
+        tmp_path = path.with_name(f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size -= self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._size += len(data)
+
+            evicted = []
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_name, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_name)
+
+        for old_name in evicted:
+            try:
+                (self.directory / old_name).unlink()
+            except FileNotFoundError:
+                pass
+        return path
+
+    def resize(self, max_bytes: int):
+        """Change the size budget, evicting immediately if now over it"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            evicted = []
+            while self._size > self.max_bytes and self._entries:
+                old_name, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_name)
+
+        for old_name in evicted:
+            try:
+                (self.directory / old_name).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class ChartRenderer:
+    """Renders registered charts to images through the disk cache"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.cache = DiskLRUCache(
+            str(Path(settings.cache.directory) / "charts"),
+            settings.cache.render_cache_max_bytes
+        )
+        self.charts = VersionedCache(1024)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.settings.cache.render_workers <= 0:
+            return None
+        if self._pool is None:
+            # Never fork a threaded server
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.settings.cache.render_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def apply_settings(self, settings: Settings):
+        """Pick up a new cache budget and worker count"""
+        old = self.settings.cache
+        self.settings = settings
+        if settings.cache.render_cache_max_bytes != old.render_cache_max_bytes:
+            self.cache.resize(settings.cache.render_cache_max_bytes)
+        if settings.cache.render_workers != old.render_workers and self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def register(self, chart_id: str, spec: Dict[str, Any], figure: Optional[Dict[str, Any]] = None):
+        """Remember the spec a chart was created from, and the figure chart_service built for it"""
+        self.charts.set(chart_id, {"spec": spec, "figure": figure})
+
+    def get_spec(self, chart_id: str) -> Optional[Dict[str, Any]]:
+        chart = self.charts.get(chart_id)
+        return chart["spec"] if chart is not None else None
+
+    async def _render(self, prepared: Dict[str, Any], fmt: str, width: int, height: int,
+                      figure: Optional[Dict[str, Any]], title: Optional[str]) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_pool(), render_figure, prepared, fmt, width, height, figure, title
+        )
+
+    async def render(self, chart_id: str, prepared: Dict[str, Any], fmt: str = "png") -> Path:
+        """Return the cached image of a registered chart for a data version, rendering it on a miss"""
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported format: {fmt}. Available: {sorted(MEDIA_TYPES)}")
+        chart = self.charts.get(chart_id)
+        if chart is None:
+            raise KeyError(chart_id)
+        spec, figure = chart["spec"], chart["figure"]
+        # The size comes from settings, so a changed default must not serve old images
+        defaults = self.settings.ui.chart_defaults
+        width, height = int(defaults.get("width", 800)), int(defaults.get("height", 400))
+        key = render_key(spec, figure, prepared.get("version", ""), fmt, width, height)
+        name = f"{key}.{fmt}"
+
+        path = self.cache.get(name)
+        if path is not None:
+            return path
+
+        # Concurrent exports of the same chart share one render
+        pending = self._inflight.get(name)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this request was cancelled, not the shared render
+                return await self.render(chart_id, prepared, fmt)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[name] = future
+        try:
+            title = (spec.get("options") or {}).get("title")
+            data = await self._render(prepared, fmt, width, height, figure, title)
+            path = await asyncio.to_thread(self.cache.set, name, data)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            # Resolve the future on cancellation too, or every waiter would hang
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(name, None)
+
+    def prerender(self, chart_id: str, prepared: Dict[str, Any], fmt: str = "png"):
+        """Warm the cache in the background when pre-rendering is enabled"""
+        if not self.settings.cache.prerender_charts:
+            return
+
+        async def _run():
+            try:
+                await self.render(chart_id, prepared, fmt)
+            except Exception as e:
+                logger.warning(f"Chart pre-render failed: {e}")
+
+        task = asyncio.create_task(_run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get render cache statistics"""
+        return self.cache.get_stats()
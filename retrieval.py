@@ -0,0 +1,497 @@
+"""
+Workbook retrieval for Ollama Excel Studio
+A per-workbook inverted index over cell text and headers, optionally paired
+with Ollama embeddings, so chat sends the rows relevant to a question instead
+of the whole file. Indexes are rebuilt in the background after writes,
+re-reading only the sheets whose parts changed and re-embedding only rows
+whose text changed
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from core.config import Settings
+from core.cache import VersionedCache, file_version
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/]\w+)*")
+BM25_K1 = 1.2
+BM25_B = 0.75
+HEADER_BOOST = 0.5
+EMBED_BATCH = 64
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _cell_text(value: Any) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    return str(value).strip()
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def sheet_fingerprints(path: Path) -> Optional[Dict[str, str]]:
+    """Fingerprint each sheet of an .xlsx from its own zip entry CRC, without parsing cells
+
+    xl/sharedStrings.xml is left out: every save rewrites it, so including it
+    would reindex all sheets after a write to one. Strings are numbered by first
+    use, so an edit almost always changes the edited sheet's own part; only the
+    sheets whose part changed are re-read (and have their strings resolved).
+    """
+    if path.suffix.lower() not in (".xlsx", ".xlsm"):
+        return None
+    try:
+        with zipfile.ZipFile(path) as archive:
+            crcs = {info.filename: info.CRC for info in archive.infolist()}
+            workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+            rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError):
+        return None
+
+    targets = {rel.get("Id"): rel.get("Target", "") for rel in rels}
+    fingerprints = {}
+    for sheet in workbook.iter(f"{MAIN_NS}sheet"):
+        target = targets.get(sheet.get(f"{REL_NS}id"), "")
+        part = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        if part not in crcs:
+            return None
+        fingerprints[sheet.get("name")] = f"{crcs[part]:08x}"
+    return fingerprints
+
+
+class SheetIndex:
+    """Rows of one sheet with an inverted index over their cell text"""
+
+    def __init__(self, name: str, headers: List[str], rows: List[Tuple[int, List[str]]],
+                 fingerprint: Optional[str] = None):
+        self.name = name
+        self.headers = headers
+        self.rows = rows  # (Excel row number, cell texts aligned with headers)
+        self.fingerprint = fingerprint
+        self.vectors: Optional[np.ndarray] = None
+        self.lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        for i, (_, cells) in enumerate(rows):
+            tokens = [token for cell in cells for token in tokenize(cell)]
+            self.lengths.append(len(tokens))
+            for token in tokens:
+                row_counts = self.postings.setdefault(token, {})
+                row_counts[i] = row_counts.get(i, 0) + 1
+        self.header_tokens = {token for header in headers for token in tokenize(header)}
+
+    @classmethod
+    def from_frame(cls, name: str, frame: pd.DataFrame, fingerprint: Optional[str],
+                   max_rows: int) -> "SheetIndex":
+        headers = [str(column) for column in frame.columns]
+        rows = []
+        for offset, values in enumerate(frame.head(max_rows).itertuples(index=False, name=None)):
+            cells = [_cell_text(value) for value in values]
+            if any(cells):
+                rows.append((offset + 2, cells))  # header is row 1
+        return cls(name, headers, rows, fingerprint)
+
+    def row_values(self, i: int) -> Dict[str, str]:
+        return {header: cell for header, cell in zip(self.headers, self.rows[i][1]) if cell}
+
+    def row_text(self, i: int) -> str:
+        return " | ".join(f"{header}: {cell}" for header, cell in self.row_values(i).items())
+
+    def row_hashes(self) -> List[str]:
+        return [hashlib.sha1(self.row_text(i).encode()).hexdigest()[:16] for i in range(len(self.rows))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "headers": self.headers,
+            "rows": self.rows,
+            "fingerprint": self.fingerprint
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SheetIndex":
+        return cls(data["name"], data["headers"], [tuple(row) for row in data["rows"]], data.get("fingerprint"))
+
+
+class WorkbookIndex:
+    """Lexical (BM25) and optional vector search over every sheet of a workbook"""
+
+    def __init__(self, filename: str, version: str, sheets: Dict[str, SheetIndex],
+                 embedding_model: Optional[str] = None):
+        self.filename = filename
+        self.version = version
+        self.sheets = sheets
+        self.embedding_model = embedding_model
+
+    @property
+    def has_vectors(self) -> bool:
+        return any(sheet.vectors is not None for sheet in self.sheets.values())
+
+    @property
+    def row_count(self) -> int:
+        return sum(len(sheet.rows) for sheet in self.sheets.values())
+
+    def _lexical(self, tokens: List[str]) -> Dict[Tuple[str, int], float]:
+        total = self.row_count
+        if not total or not tokens:
+            return {}
+        avgdl = sum(sum(sheet.lengths) for sheet in self.sheets.values()) / total or 1.0
+        scores: Dict[Tuple[str, int], float] = {}
+        for token in set(tokens):
+            df = sum(len(sheet.postings.get(token, ())) for sheet in self.sheets.values())
+            if not df:
+                continue
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for sheet in self.sheets.values():
+                for i, tf in sheet.postings.get(token, {}).items():
+                    norm = 1 - BM25_B + BM25_B * sheet.lengths[i] / avgdl
+                    key = (sheet.name, i)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        # Prefer rows from sheets whose headers mention the question's terms
+        query_tokens = set(tokens)
+        for sheet in self.sheets.values():
+            matched = len(query_tokens & sheet.header_tokens)
+            if matched:
+                for key in scores:
+                    if key[0] == sheet.name:
+                        scores[key] *= 1 + HEADER_BOOST * matched
+        return scores
+
+    def candidates(self, query: str, query_vector: Optional[np.ndarray], top_k: int) -> List[Dict[str, Any]]:
+        """Best rows by raw BM25 score and by vector similarity, unnormalized
+
+        Scores are only comparable once normalized across every workbook searched,
+        which the caller does.
+        """
+        lexical = self._lexical(tokenize(query))
+        keys = {key for key, _ in sorted(lexical.items(), key=lambda item: item[1], reverse=True)[:top_k]}
+        similarities: Dict[str, np.ndarray] = {}
+        if query_vector is not None:
+            for sheet in self.sheets.values():
+                if sheet.vectors is not None:
+                    similarities[sheet.name] = sheet.vectors @ query_vector
+                    keys.update((sheet.name, i) for i in np.argsort(-similarities[sheet.name])[:top_k].tolist())
+
+        return [
+            {
+                "file": self.filename,
+                "sheet": name,
+                "row": self.sheets[name].rows[i][0],
+                "lexical": lexical.get((name, i), 0.0),
+                "similarity": float(similarities[name][i]) if name in similarities else None,
+                "values": self.sheets[name].row_values(i)
+            }
+            for name, i in keys
+        ]
+
+
+class RetrievalIndex:
+    """Builds, stores and queries retrieval indexes alongside workbooks"""
+
+    def __init__(self, settings: Settings, executor):
+        self.settings = settings
+        self.executor = executor
+        self._loaded = VersionedCache(8)  # filename -> newest index seen
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._dirty: set = set()
+
+    @property
+    def metadata_directory(self) -> Path:
+        return Path(self.settings.excel.directory) / ".metadata"
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def _file_path(self, filename: str) -> Path:
+        return Path(self.settings.excel.directory) / Path(filename).name
+
+    def _index_path(self, filename: str) -> Path:
+        return self.metadata_directory / f"{Path(filename).name}.index.json"
+
+    def _vectors_path(self, filename: str) -> Path:
+        return self.metadata_directory / f"{Path(filename).name}.vectors.npz"
+
+    # ── Embeddings ──
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts with the configured Ollama model (blocking; run in a worker thread)"""
+        vectors: List[List[float]] = []
+        with httpx.Client(base_url=self.settings.ollama.base_url,
+                          timeout=self.settings.ollama.timeout_seconds) as client:
+            for start in range(0, len(texts), EMBED_BATCH):
+                response = client.post("/api/embed", json={
+                    "model": self.settings.retrieval.embedding_model,
+                    "input": texts[start:start + EMBED_BATCH]
+                })
+                response.raise_for_status()
+                vectors.extend(response.json()["embeddings"])
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+    async def _embed_query(self, query: str) -> Optional[np.ndarray]:
+        try:
+            async with httpx.AsyncClient(base_url=self.settings.ollama.base_url,
+                                         timeout=self.settings.ollama.timeout_seconds) as client:
+                response = await client.post("/api/embed", json={
+                    "model": self.settings.retrieval.embedding_model,
+                    "input": [query]
+                })
+                response.raise_for_status()
+            return _normalize(np.asarray(response.json()["embeddings"][0], dtype=np.float32))
+        except Exception as e:
+            logger.warning(f"Query embedding failed, using lexical retrieval only: {e}")
+            return None
+
+    def _attach_vectors(self, index: WorkbookIndex, previous: Optional[WorkbookIndex]):
+        """Give each sheet row vectors, reusing those of unchanged rows"""
+        model = self.settings.retrieval.embedding_model
+        index.embedding_model = model
+        if not model:
+            return
+        if index.row_count > self.settings.retrieval.max_embedded_rows:
+            logger.info(f"{index.filename} has {index.row_count} rows; using lexical retrieval only")
+            return
+
+        known: Dict[str, np.ndarray] = {}
+        if previous is not None and previous.embedding_model == model:
+            for sheet in previous.sheets.values():
+                if sheet.vectors is not None:
+                    known.update(zip(sheet.row_hashes(), sheet.vectors))
+
+        try:
+            for sheet in index.sheets.values():
+                if not sheet.rows:
+                    continue
+                hashes = sheet.row_hashes()
+                missing = [i for i, h in enumerate(hashes) if h not in known]
+                if missing:
+                    fresh = self.embed([sheet.row_text(i) for i in missing])
+                    known.update(zip((hashes[i] for i in missing), fresh))
+                sheet.vectors = np.stack([known[h] for h in hashes])
+        except Exception as e:
+            logger.warning(f"Embedding {index.filename} failed, using lexical retrieval only: {e}")
+            for sheet in index.sheets.values():
+                sheet.vectors = None
+
+    # ── Storage ──
+
+    def _read(self, filename: str) -> Optional[WorkbookIndex]:
+        """Load the stored index whatever file version it was built from"""
+        try:
+            with open(self._index_path(filename), "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        sheets = {sheet["name"]: SheetIndex.from_dict(sheet) for sheet in data["sheets"]}
+        index = WorkbookIndex(data["filename"], data["version"], sheets, data.get("embedding_model"))
+        if data.get("embedding_model"):
+            try:
+                with np.load(self._vectors_path(filename)) as stored:
+                    for position, sheet in enumerate(sheets.values()):
+                        if f"v{position}" in stored:
+                            sheet.vectors = stored[f"v{position}"]
+            except (OSError, ValueError):
+                pass
+        return index
+
+    def _write(self, index: WorkbookIndex):
+        self.metadata_directory.mkdir(parents=True, exist_ok=True)
+        index_path = self._index_path(index.filename)
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "filename": index.filename,
+                "version": index.version,
+                "embedding_model": index.embedding_model,
+                "sheets": [sheet.to_dict() for sheet in index.sheets.values()]
+            }, f)
+        os.replace(tmp_path, index_path)
+
+        vectors_path = self._vectors_path(index.filename)
+        if index.has_vectors:
+            tmp_path = vectors_path.with_name(f"{vectors_path.stem}.tmp.npz")
+            np.savez(tmp_path, **{
+                f"v{position}": sheet.vectors
+                for position, sheet in enumerate(index.sheets.values())
+                if sheet.vectors is not None
+            })
+            os.replace(tmp_path, vectors_path)
+        else:
+            vectors_path.unlink(missing_ok=True)
+
+    # ── Building ──
+
+    def build(self, filename: str) -> WorkbookIndex:
+        """Index a workbook, re-reading only sheets that changed since the stored index"""
+        path = self._file_path(filename)
+        version = file_version(path)
+        previous = self._read(filename)
+        max_rows = self.settings.retrieval.max_rows_per_sheet
+
+        def index_sheet(name: str, frame: pd.DataFrame, fingerprint: Optional[str]) -> SheetIndex:
+            if len(frame) > max_rows:
+                logger.info(f"Indexing only the first {max_rows} of {len(frame)} rows of {path.name}/{name}")
+            return SheetIndex.from_frame(name, frame, fingerprint, max_rows)
+
+        if path.suffix.lower() == ".csv":
+            sheets = {path.stem: index_sheet(path.stem, pd.read_csv(path), None)}
+        else:
+            fingerprints = sheet_fingerprints(path)
+            old_sheets = previous.sheets if previous is not None else {}
+            if fingerprints is None:
+                stale = None
+            else:
+                stale = [
+                    name for name, fingerprint in fingerprints.items()
+                    if name not in old_sheets or old_sheets[name].fingerprint != fingerprint
+                ]
+            frames = pd.read_excel(path, sheet_name=stale) if stale != [] else {}
+            sheets = {}
+            for name in (fingerprints or frames):
+                if name in frames:
+                    fingerprint = fingerprints.get(name) if fingerprints else None
+                    sheets[name] = index_sheet(name, frames[name], fingerprint)
+                else:
+                    sheets[name] = old_sheets[name]
+            if stale is not None:
+                logger.debug(f"Reindexed {len(stale)} of {len(sheets)} sheets of {path.name}")
+
+        index = WorkbookIndex(path.name, version, sheets)
+        self._attach_vectors(index, previous)
+        self._write(index)
+        self._loaded.set(path.name, index)
+        return index
+
+    def lookup(self, filename: str) -> Tuple[Optional[WorkbookIndex], bool]:
+        """Newest available index and whether it matches the current file version
+
+        A stale index is still returned, so chat keeps its grounding while the
+        rebuild after a write runs.
+        """
+        path = self._file_path(filename)
+        try:
+            version = file_version(path)
+        except FileNotFoundError:
+            return None, False
+
+        index = self._loaded.get(path.name)
+        if index is None:
+            index = self._read(filename)
+            if index is None:
+                return None, False
+            self._loaded.set(path.name, index)
+        return index, index.version == version
+
+    def get(self, filename: str) -> Optional[WorkbookIndex]:
+        """Index matching the current file version, or None when it needs rebuilding"""
+        index, fresh = self.lookup(filename)
+        return index if fresh else None
+
+    def schedule(self, filename: str):
+        """Rebuild the index in the background; coalesces bursts of writes"""
+        if not self.settings.retrieval.enabled:
+            return
+        name = Path(filename).name
+        if name in self._tasks:
+            self._dirty.add(name)
+            return
+        self._tasks[name] = asyncio.create_task(self._run(name))
+
+    async def _run(self, name: str):
+        try:
+            while True:
+                self._dirty.discard(name)
+                try:
+                    await self.executor.run_io(self.build, name)
+                except FileNotFoundError:
+                    return
+                except Exception as e:
+                    logger.warning(f"Indexing {name} failed: {e}")
+                    return
+                if name not in self._dirty:
+                    return
+        finally:
+            self._tasks.pop(name, None)
+
+    def remove(self, filename: str):
+        """Delete the stored index for a file"""
+        name = Path(filename).name
+        self._index_path(name).unlink(missing_ok=True)
+        self._vectors_path(name).unlink(missing_ok=True)
+        self._loaded.invalidate(lambda key: key == name)
+
+    # ── Querying ──
+
+    async def search(self, files: List[str], query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most relevant rows across files, within the chat context budget"""
+        config = self.settings.retrieval
+        if not config.enabled or not files or not query:
+            return []
+
+        indexes = []
+        for filename in files:
+            index, fresh = await self.executor.run_io(self.lookup, filename)
+            if not fresh:
+                self.schedule(filename)  # answer from the previous index (or without rows) meanwhile
+            if index is not None:
+                indexes.append(index)
+        if not indexes:
+            return []
+
+        top_k = top_k or config.top_k
+        query_vector = None
+        if config.embedding_model and any(index.has_vectors for index in indexes):
+            query_vector = await self._embed_query(query)
+
+        hits: List[Dict[str, Any]] = []
+        for index in indexes:
+            hits.extend(await self.executor.run_io(index.candidates, query, query_vector, top_k))
+
+        # Normalize across all workbooks, so a weak match in one file cannot tie a strong one in another
+        top = max((hit["lexical"] for hit in hits), default=0.0) or 1.0
+        weight = config.embedding_weight if query_vector is not None else 0.0
+        for hit in hits:
+            similarity = max(hit.pop("similarity") or 0.0, 0.0)
+            hit["score"] = round((1 - weight) * hit.pop("lexical") / top + weight * similarity, 4)
+        hits = [hit for hit in hits if hit["score"] > 0]
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+
+        selected, used = [], 0
+        for hit in hits[:top_k]:
+            size = sum(len(key) + len(value) for key, value in hit["values"].items())
+            if selected and used + size > config.max_context_chars:
+                break
+            selected.append(hit)
+            used += size
+        return selected
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._loaded.get_stats(), "pending": self.pending}
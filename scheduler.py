@@ -0,0 +1,327 @@
+"""
+In-process job scheduler for Ollama Excel Studio
+Runs recurring template applications, exports, queries and AI summaries from
+cron-style specs stored on disk, and keeps each job's latest result so
+dashboards read precomputed output instead of triggering the work
+"""
+from pydantic import BaseModel, Field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from datetime import datetime, timedelta
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+from core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+JOB_ACTIONS = {"template", "export_pdf", "export_csv", "query", "summary"}
+# Feature flag an action needs, checked at run time like the matching endpoints
+ACTION_FEATURES = {"template": "enable_templates", "export_pdf": "enable_export", "export_csv": "enable_export"}
+
+_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@weekdays": "0 0 * * 1-5"
+}
+
+
+def _parse_field(text: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in text.split(","):
+        body, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in cron field: {part}")
+        if body == "*":
+            start, end = low, high
+        elif "-" in body:
+            start_text, end_text = body.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(body)
+            end = high if step_text else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field out of range {low}-{high}: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSpec:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0=Sunday)"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = _ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression}")
+        parsed = [_parse_field(f, low, high) for f, (low, high) in zip(fields, _FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}  # 7 is also Sunday
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: when both are restricted, either may match
+        if not self._any_day and not self._any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def matches(self, dt: datetime) -> bool:
+        return (
+            dt.minute in self.minutes
+            and dt.hour in self.hours
+            and dt.month in self.months
+            and self._day_matches(dt)
+        )
+
+    def next_after(self, dt: datetime) -> Optional[datetime]:
+        """First matching minute strictly after `dt` (within about five years)"""
+        current = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = current + timedelta(days=366 * 5)
+        while current < limit:
+            if current.month not in self.months or not self._day_matches(current):
+                current = (current + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if current.hour not in self.hours:
+                current = (current + timedelta(hours=1)).replace(minute=0)
+                continue
+            if current.minute in self.minutes:
+                return current
+            current += timedelta(minutes=1)
+        return None
+
+
+class ScheduledJobRequest(BaseModel):
+    """Request body for creating or replacing a scheduled job"""
+    name: str
+    cron: str
+    action: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    enabled: bool = True
+
+
+class ScheduledJob(ScheduledJobRequest):
+    """A stored job with its run state"""
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex[:12])
+    last_run: Optional[str] = None
+    last_status: Optional[str] = None
+    last_error: Optional[str] = None
+    last_duration_ms: Optional[float] = None
+
+
+JobAction = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class Scheduler:
+    """Runs stored jobs at their cron times on the shared worker pools"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.actions: Dict[str, JobAction] = {}
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._running: Set[str] = set()
+        self._semaphore = asyncio.Semaphore(settings.scheduler.max_concurrent_jobs)
+        self._task: Optional[asyncio.Task] = None
+        self._job_tasks: Set[asyncio.Task] = set()
+        self._last_tick: Optional[datetime] = None
+        self._load()
+
+    @property
+    def jobs_file(self) -> Path:
+        return Path(self.settings.scheduler.jobs_file)
+
+    @property
+    def results_directory(self) -> Path:
+        return Path(self.settings.scheduler.results_directory)
+
+    def _load(self):
+        if not self.jobs_file.exists():
+            return
+        try:
+            with open(self.jobs_file, "r") as f:
+                data = json.load(f)
+            self.jobs = {job["id"]: ScheduledJob(**job) for job in data.get("jobs", [])}
+        except Exception as e:
+            logger.error(f"Could not load scheduled jobs from {self.jobs_file}: {e}")
+
+    def _save(self):
+        self.jobs_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.jobs_file.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"jobs": [job.model_dump() for job in self.jobs.values()]}, f, indent=2)
+        os.replace(tmp, self.jobs_file)
+
+    def register_action(self, name: str, handler: JobAction):
+        """Provide the coroutine that performs an action, given the job's params"""
+        self.actions[name] = handler
+
+    def _validate(self, request: ScheduledJobRequest):
+        CronSpec(request.cron)
+        if request.action not in JOB_ACTIONS:
+            raise ValueError(f"Unknown action: {request.action}. Available: {sorted(JOB_ACTIONS)}")
+
+    def add(self, request: ScheduledJobRequest) -> ScheduledJob:
+        self._validate(request)
+        job = ScheduledJob(**request.model_dump())
+        self.jobs[job.id] = job
+        self._save()
+        return job
+
+    def update(self, job_id: str, request: ScheduledJobRequest) -> ScheduledJob:
+        if job_id not in self.jobs:
+            raise FileNotFoundError(job_id)
+        self._validate(request)
+        job = self.jobs[job_id].model_copy(update=request.model_dump())
+        self.jobs[job_id] = job
+        self._save()
+        return job
+
+    def remove(self, job_id: str):
+        if self.jobs.pop(job_id, None) is None:
+            raise FileNotFoundError(job_id)
+        (self.results_directory / f"{job_id}.json").unlink(missing_ok=True)
+        self._save()
+
+    def describe(self, job: ScheduledJob) -> Dict[str, Any]:
+        next_run = CronSpec(job.cron).next_after(datetime.now()) if job.enabled else None
+        return {
+            **job.model_dump(),
+            "next_run": next_run.isoformat() if next_run else None,
+            "running": job.id in self._running
+        }
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [self.describe(job) for job in self.jobs.values()]
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Latest stored result of a job"""
+        if job_id not in self.jobs:
+            raise FileNotFoundError(job_id)
+        path = self.results_directory / f"{job_id}.json"
+        if not path.exists():
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def disabled_feature(self, action: str) -> Optional[str]:
+        """The feature flag that currently blocks an action, if any"""
+        feature = ACTION_FEATURES.get(action)
+        if feature is not None and not getattr(self.settings.features, feature):
+            return feature
+        return None
+
+    def _store_result(self, job: ScheduledJob, result: Any):
+        self.results_directory.mkdir(parents=True, exist_ok=True)
+        path = self.results_directory / f"{job.id}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({
+                "job_id": job.id,
+                "name": job.name,
+                "action": job.action,
+                "ran_at": job.last_run,
+                "duration_ms": job.last_duration_ms,
+                "result": result
+            }, f, default=str)
+        os.replace(tmp, path)
+
+    async def run_job(self, job_id: str) -> ScheduledJob:
+        """Run a job now (also used by the timer); concurrent runs of one job are skipped"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise FileNotFoundError(job_id)
+        handler = self.actions.get(job.action)
+        if handler is None:
+            raise ValueError(f"No handler registered for action: {job.action}")
+        feature = self.disabled_feature(job.action)
+        if feature is not None:
+            raise PermissionError(f"{job.action} jobs are disabled (features.{feature} is off)")
+        if job.id in self._running:
+            return job
+
+        self._running.add(job.id)
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                job.last_run = datetime.now().isoformat()
+                try:
+                    result = await handler(job.params)
+                    job.last_status, job.last_error = "success", None
+                except Exception as e:
+                    result = None
+                    job.last_status, job.last_error = "error", str(e)
+                    logger.error(f"Scheduled job {job.name} ({job.id}) failed: {e}")
+                job.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                if job.last_status == "success":
+                    await asyncio.to_thread(self._store_result, job, result)
+                self._save()
+        finally:
+            self._running.discard(job.id)
+        return job
+
+    async def _run(self):
+        while True:
+            # Wake at the start of each minute
+            now = datetime.now()
+            await asyncio.sleep(60 - now.second - now.microsecond / 1e6)
+            minute = (datetime.now() + timedelta(seconds=1)).replace(second=0, microsecond=0)
+            if self._last_tick is not None and minute <= self._last_tick:
+                continue
+            self._last_tick = minute
+            for job in list(self.jobs.values()):
+                if not job.enabled:
+                    continue
+                try:
+                    due = CronSpec(job.cron).matches(minute)
+                except ValueError:
+                    continue
+                if not due:
+                    continue
+                feature = self.disabled_feature(job.action)
+                if feature is not None:
+                    logger.info(f"Skipping scheduled job {job.name} ({job.id}): features.{feature} is off")
+                    continue
+                logger.info(f"Running scheduled job {job.name} ({job.id})")
+                task = asyncio.create_task(self.run_job(job.id))
+                self._job_tasks.add(task)
+                task.add_done_callback(self._job_tasks.discard)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Scheduler started with {len(self.jobs)} jobs")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def apply_settings(self, settings: Settings):
+        if settings.scheduler.max_concurrent_jobs != self.settings.scheduler.max_concurrent_jobs:
+            self._semaphore = asyncio.Semaphore(settings.scheduler.max_concurrent_jobs)
+        self.settings = settings
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "jobs": len(self.jobs),
+            "active": len(self._running)
+        }
@@ -0,0 +1,95 @@
+"""
+Startup helpers for Ollama Excel Studio
+Lazy service proxies and cold-start timing, so heavy services and libraries
+are only loaded when first used and their cost is visible
+"""
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_process_started = time.perf_counter()
+
+
+class StartupProfile:
+    """Records how long each startup phase and lazy initialization took"""
+
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self.ready_after_ms: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            self.phases.append({
+                "phase": name,
+                "at_ms": round((started - _process_started) * 1000, 1),
+                "duration_ms": round(duration_ms, 1)
+            })
+            logger.info(f"⏱ {name}: {duration_ms:.0f}ms")
+
+    def mark_ready(self):
+        self.ready_after_ms = round((time.perf_counter() - _process_started) * 1000, 1)
+        logger.info(f"⏱ Ready {self.ready_after_ms:.0f}ms after main import")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready_after_ms": self.ready_after_ms,
+            "phases": sorted(self.phases, key=lambda p: p["duration_ms"], reverse=True)
+        }
+
+
+startup_profile = StartupProfile()
+
+
+class LazyService:
+    """Proxy that builds the real service on first attribute access"""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        """Return the real service, building it if needed"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    with startup_profile.phase(f"init {self._name}"):
+                        self._instance = self._factory()
+        return self._instance
+
+    def is_initialized(self) -> bool:
+        return self._instance is not None
+
+    def reset(self) -> Any:
+        """Drop the built service so its next use builds a new one; returns the old instance"""
+        with self._lock:
+            instance, self._instance = self._instance, None
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+
+def lazy_service(module: str, class_name: str, build_args: Callable[[], tuple] = tuple) -> LazyService:
+    """LazyService that also defers importing the module defining the class
+
+    `build_args` is called at build time, so services created after a config
+    reload get the current settings.
+    """
+    def factory():
+        with startup_profile.phase(f"import {module}"):
+            cls = getattr(importlib.import_module(module), class_name)
+        return cls(*build_args())
+
+    return LazyService(class_name, factory)
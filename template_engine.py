@@ -0,0 +1,370 @@
+"""
+Template engine for Ollama Excel Studio
+Templates are compiled once into an in-memory plan (resolved styles, cell
+coordinates and parameter placeholders) and only recompiled when the
+template file changes. Parameters are substituted only where a cell says so
+with {{name}}; all other text, including formulas, is written verbatim.
+Rendered workbooks are returned as bytes for the Excel service to save.
+"""
+from pydantic import BaseModel, Field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from pathlib import Path
+import importlib.util
+import io
+import json
+import logging
+import os
+import re
+import threading
+
+from core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class BulkTemplateJob(BaseModel):
+    """One output file of a bulk template run"""
+    filename: str
+    parameters: Dict[str, Any] = Field(default_factory=dict)
+
+
+class BulkTemplateRequest(BaseModel):
+    """Request body for /api/templates/apply-bulk"""
+    template_name: str
+    jobs: List[BulkTemplateJob]
+
+
+@dataclass
+class CompiledValue:
+    """A cell value, pre-split into literal text and {{name}} placeholders"""
+    raw: Any
+    fields: Tuple[str, ...] = ()
+    literals: Tuple[str, ...] = ()
+
+    def render(self, parameters: Dict[str, Any]) -> Any:
+        if not self.fields:
+            return self.raw
+        # A value that is exactly one placeholder keeps the parameter's type
+        if len(self.fields) == 1 and self.literals == ("", ""):
+            return parameters.get(self.fields[0])
+        parts = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            value = parameters.get(name)
+            parts.append("" if value is None else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+
+@dataclass
+class CompiledCell:
+    row: int
+    column: int
+    value: CompiledValue
+    style: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class CompiledRows:
+    """A table block filled from a list parameter"""
+    row: int
+    column: int
+    source: str
+    columns: List[str]
+    style: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class CompiledSheet:
+    name: str
+    cells: List[CompiledCell] = field(default_factory=list)
+    rows: List[CompiledRows] = field(default_factory=list)
+    column_widths: Dict[str, float] = field(default_factory=dict)
+    freeze_panes: Optional[str] = None
+
+
+@dataclass
+class CompiledTemplate:
+    """Executable plan for a template"""
+    name: str
+    path: Path
+    mtimes: Dict[str, int]
+    parameters: Dict[str, Any]
+    sheets: List[CompiledSheet]
+    script: Optional[Callable] = None
+
+    def resolve_parameters(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in declared defaults and check required parameters"""
+        resolved = {}
+        for name, spec in self.parameters.items():
+            if isinstance(spec, dict):
+                if "default" in spec:
+                    resolved[name] = spec["default"]
+                elif spec.get("required") and name not in parameters:
+                    raise ValueError(f"Template {self.name} requires parameter: {name}")
+            else:
+                resolved[name] = spec
+        resolved.update(parameters)
+        return resolved
+
+
+def _registry_entries(path: Path) -> List[Dict[str, Any]]:
+    """Template registrations in a config.json (one object, a list, or {"templates": [...]})"""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("templates", [data])
+    return [entry for entry in data if isinstance(entry, dict) and entry.get("name")]
+
+
+def _script_name(entry: Dict[str, Any]) -> str:
+    """Script registered by a config.json entry; "My Template" defaults to my_template.py"""
+    return entry.get("script") or entry.get("file") or f"{entry['name'].strip().lower().replace(' ', '_')}.py"
+
+
+def _load_script(path: Path, module_name: str) -> Callable:
+    module_spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return getattr(module, "apply_template")
+
+
+def _compile_value(value: Any) -> CompiledValue:
+    if not isinstance(value, str):
+        return CompiledValue(value)
+    pieces = PLACEHOLDER.split(value)
+    return CompiledValue(value, tuple(pieces[1::2]), tuple(pieces[0::2]))
+
+
+def _compile_style(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve a JSON style spec into openpyxl style objects"""
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    style: Dict[str, Any] = {}
+    if "font" in spec:
+        style["font"] = Font(**spec["font"])
+    if "fill" in spec:
+        color = spec["fill"]
+        style["fill"] = PatternFill(fill_type="solid", start_color=color, end_color=color)
+    if "alignment" in spec:
+        style["alignment"] = Alignment(**spec["alignment"])
+    if "border" in spec:
+        side = Side(style=spec["border"])
+        style["border"] = Border(left=side, right=side, top=side, bottom=side)
+    if "number_format" in spec:
+        style["number_format"] = spec["number_format"]
+    return style
+
+
+def _coordinates(cell: str) -> Tuple[int, int]:
+    from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
+
+    column, row = coordinate_from_string(cell)
+    return row, column_index_from_string(column)
+
+
+def _apply_style(cell, style: Optional[Dict[str, Any]]):
+    if style:
+        for attr, value in style.items():
+            setattr(cell, attr, value)
+
+
+class TemplateEngine:
+    """Compiles templates from settings.template_directory and applies them"""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._compiled: Dict[str, CompiledTemplate] = {}
+        # name -> (definition file, config.json registry entry or None for JSON specs)
+        self._index: Dict[str, Tuple[Path, Optional[Dict[str, Any]]]] = {}
+        self._signature: Optional[Tuple] = None
+        self._misses: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def template_directory(self) -> Path:
+        return Path(self.settings.template_directory)
+
+    def _directory_signature(self) -> Tuple:
+        """Directory and registry mtimes; unchanged means a rescan would find nothing new"""
+        signature = []
+        for root, _, files in os.walk(self.template_directory):
+            signature.append((root, os.stat(root).st_mtime_ns))
+            if "config.json" in files:
+                registry = os.path.join(root, "config.json")
+                signature.append((registry, os.stat(registry).st_mtime_ns))
+        return tuple(signature)
+
+    def _scan(self):
+        """Index JSON definitions by file stem and declared name, and config.json registrations"""
+        index: Dict[str, Tuple[Path, Optional[Dict[str, Any]]]] = {}
+        if self.template_directory.exists():
+            for path in self.template_directory.rglob("*.json"):
+                try:
+                    if path.name == "config.json":
+                        for entry in _registry_entries(path):
+                            index[entry["name"]] = (path, entry)
+                        continue
+                    index[path.stem] = (path, None)
+                    with open(path, "r") as f:
+                        declared = json.load(f).get("name")
+                    if declared:
+                        index[declared] = (path, None)
+                except (OSError, json.JSONDecodeError, AttributeError):
+                    continue
+        self._index = index
+        self._signature = self._directory_signature()
+        self._misses = set()
+
+    def _find(self, template_name: str) -> Optional[Tuple[Path, Optional[Dict[str, Any]]]]:
+        found = self._index.get(template_name)
+        if found is not None and found[0].exists():
+            return found
+        # Known misses are only rechecked once the template tree has changed
+        if template_name in self._misses and self._directory_signature() == self._signature:
+            return None
+        self._scan()
+        found = self._index.get(template_name)
+        if found is None:
+            self._misses.add(template_name)
+        return found
+
+    def has(self, template_name: str) -> bool:
+        with self._lock:
+            return self._find(template_name) is not None
+
+    @staticmethod
+    def _mtimes(paths: List[Path]) -> Dict[str, int]:
+        return {str(p): os.stat(p).st_mtime_ns for p in paths if p.exists()}
+
+    def _compile_registered(self, path: Path, entry: Dict[str, Any]) -> CompiledTemplate:
+        """A config.json registration: a Python apply_template(workbook, params) script"""
+        script_path = path.parent / _script_name(entry)
+        return CompiledTemplate(
+            name=entry["name"],
+            path=path,
+            mtimes=self._mtimes([path, script_path]),
+            parameters=entry.get("parameters", {}),
+            sheets=[],
+            script=_load_script(script_path, f"template_{script_path.stem}")
+        )
+
+    def _compile(self, path: Path, entry: Optional[Dict[str, Any]] = None) -> CompiledTemplate:
+        if entry is not None:
+            return self._compile_registered(path, entry)
+        with open(path, "r") as f:
+            spec = json.load(f)
+
+        styles = {name: _compile_style(s) for name, s in spec.get("styles", {}).items()}
+        sheets = []
+        for sheet_spec in spec.get("sheets", []):
+            sheet = CompiledSheet(
+                name=sheet_spec["name"],
+                column_widths=sheet_spec.get("column_widths", {}),
+                freeze_panes=sheet_spec.get("freeze_panes")
+            )
+            for cell_spec in sheet_spec.get("cells", []):
+                row, column = _coordinates(cell_spec["cell"])
+                raw = cell_spec.get("formula", cell_spec.get("value"))
+                sheet.cells.append(CompiledCell(
+                    row, column, _compile_value(raw), styles.get(cell_spec.get("style"))
+                ))
+            for block in sheet_spec.get("rows", []):
+                row, column = _coordinates(block["start"])
+                sheet.rows.append(CompiledRows(
+                    row, column, block["source"], block.get("columns", []),
+                    styles.get(block.get("style"))
+                ))
+            sheets.append(sheet)
+
+        watched = [path]
+        script = None
+        if spec.get("script"):
+            script_path = path.parent / spec["script"]
+            watched.append(script_path)
+            script = _load_script(script_path, f"template_{path.stem}")
+
+        return CompiledTemplate(
+            name=spec.get("name", path.stem),
+            path=path,
+            mtimes=self._mtimes(watched),
+            parameters=spec.get("parameters", {}),
+            sheets=sheets,
+            script=script
+        )
+
+    def get(self, template_name: str) -> CompiledTemplate:
+        """Return the compiled plan, recompiling only if its files changed"""
+        with self._lock:
+            found = self._find(template_name)
+        if found is None:
+            raise FileNotFoundError(f"Template not found: {template_name}")
+        path, entry = found
+
+        with self._lock:
+            compiled = self._compiled.get(template_name)
+            if compiled is not None:
+                try:
+                    current = self._mtimes([Path(p) for p in compiled.mtimes])
+                except OSError:
+                    current = {}
+                if current == compiled.mtimes and compiled.path == path:
+                    return compiled
+
+            compiled = self._compile(path, entry)
+            self._compiled[template_name] = compiled
+            logger.info(f"Compiled template {template_name}")
+            return compiled
+
+    def _execute(self, plan: CompiledTemplate, workbook, parameters: Dict[str, Any]):
+        """Execute a compiled plan against an open workbook"""
+        for sheet_plan in plan.sheets:
+            if sheet_plan.name in workbook.sheetnames:
+                ws = workbook[sheet_plan.name]
+            else:
+                ws = workbook.create_sheet(sheet_plan.name)
+
+            for cell_plan in sheet_plan.cells:
+                cell = ws.cell(row=cell_plan.row, column=cell_plan.column,
+                               value=cell_plan.value.render(parameters))
+                _apply_style(cell, cell_plan.style)
+
+            for block in sheet_plan.rows:
+                for offset, item in enumerate(parameters.get(block.source) or []):
+                    values = [item.get(c) for c in block.columns] if isinstance(item, dict) else list(item)
+                    for col_offset, value in enumerate(values):
+                        cell = ws.cell(row=block.row + offset, column=block.column + col_offset, value=value)
+                        _apply_style(cell, block.style)
+
+            for column, width in sheet_plan.column_widths.items():
+                ws.column_dimensions[column].width = width
+            if sheet_plan.freeze_panes:
+                ws.freeze_panes = sheet_plan.freeze_panes
+
+        if plan.script is not None:
+            plan.script(workbook, parameters)
+
+    def render(self, plan: CompiledTemplate, filename: str, parameters: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
+        """Render onto the current file (or a new workbook) and return the result as bytes"""
+        from openpyxl import Workbook, load_workbook
+
+        path = Path(self.settings.excel.directory) / Path(filename).name
+        if path.exists():
+            workbook = load_workbook(path)
+        else:
+            workbook = Workbook()
+            # Drop the default sheet when the template defines its own
+            if plan.sheets:
+                workbook.remove(workbook.active)
+
+        self._execute(plan, workbook, plan.resolve_parameters(parameters))
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return buffer.getvalue(), {"filename": path.name, "template": plan.name, "sheets": workbook.sheetnames}
+
+    def apply(self, template_name: str, filename: str,
+              parameters: Optional[Dict[str, Any]] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """Render a template for one file; the caller saves the bytes through the Excel service"""
+        return self.render(self.get(template_name), filename, parameters or {})
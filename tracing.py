@@ -0,0 +1,184 @@
+"""
+Request tracing and profiling hooks for Ollama Excel Studio
+Opt-in per-request spans (validation, Excel calls, Ollama calls, broadcasts)
+and an in-process sampling profiler that emits collapsed stacks for
+flamegraph tools
+"""
+from collections import Counter as _Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+import functools
+import inspect
+import sys
+import threading
+import time
+import uuid
+
+from fastapi.routing import APIRoute
+
+MAX_PROFILE_SECONDS = 60
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Spans recorded for one request"""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.route_started: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.spans: List[Dict[str, Any]] = []
+
+    def add_span(self, name: str, start: float, end: float, **attrs):
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self._start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            **attrs
+        })
+
+    def finish(self, status: int):
+        self.status = status
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    def server_timing(self) -> str:
+        """Render spans as a Server-Timing header value"""
+        parts = [f"total;dur={self.duration_ms}"]
+        for i, s in enumerate(self.spans):
+            name = "".join(c if c.isalnum() or c in "-_" else "_" for c in s["name"])
+            parts.append(f"{name}-{i};dur={s['duration_ms']}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "spans": self.spans
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a span on the active trace; a no-op when tracing is off"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start, time.perf_counter(), **attrs)
+
+
+class Tracer:
+    """Collects request traces into a bounded in-memory buffer"""
+
+    def __init__(self, enabled: bool = False, buffer_size: int = 100):
+        self.enabled = enabled
+        self.traces: Deque[Trace] = deque(maxlen=buffer_size)
+
+    def configure(self, enabled: bool, buffer_size: int):
+        """Toggle tracing and resize the buffer, keeping the newest traces"""
+        self.enabled = enabled
+        if buffer_size != self.traces.maxlen:
+            self.traces = deque(self.traces, maxlen=buffer_size)
+
+    async def middleware(self, request, call_next):
+        """HTTP middleware: open a trace around the request when enabled"""
+        if not self.enabled:
+            return await call_next(request)
+
+        trace = Trace(request.method, request.url.path)
+        token = _current_trace.set(trace)
+        response = None
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            _current_trace.reset(token)
+            trace.finish(status)
+            self.traces.append(trace)
+            if response is not None:
+                response.headers["X-Trace-Id"] = trace.id
+                response.headers["Server-Timing"] = trace.server_timing()
+
+    def recent(self, limit: int = 20, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        traces = [t for t in self.traces if path is None or t.path == path]
+        return [t.to_dict() for t in traces[-limit:]]
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that splits request handling into validation and handler spans"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            original = endpoint
+
+            @functools.wraps(original)
+            async def endpoint(*args, **kw):
+                trace = _current_trace.get()
+                if trace is not None and trace.route_started is not None:
+                    trace.add_span("validation", trace.route_started, time.perf_counter())
+                with span("handler"):
+                    return await original(*args, **kw)
+
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.route_started = time.perf_counter()
+            return await handler(request)
+
+        return traced_handler
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    """Sample every thread's stack for `seconds` and return collapsed stacks (flamegraph.pl / speedscope format)"""
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    counts: _Counter = _Counter()
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
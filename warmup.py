@@ -0,0 +1,234 @@
+"""
+Model warm-up for Ollama Excel Studio
+Preloads the selected model at startup, refreshes its keep-alive during
+working hours and tracks which models are resident (/api/ps), so
+latency-sensitive chats can use an already-loaded model instead of waiting
+on a cold load
+"""
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import re
+import time
+
+import httpx
+
+from core.config import Settings
+from core.scheduler import CronSpec
+
+logger = logging.getLogger(__name__)
+
+SIZE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)b\b")
+
+
+def canonical_name(name: str) -> str:
+    """Ollama treats an untagged model name as `<name>:latest`"""
+    return name if ":" in name else f"{name}:latest"
+
+
+def parameter_size_b(model: Dict[str, Any]) -> Optional[float]:
+    """Parameter count in billions, from Ollama's model details or the tag"""
+    text = model.get("details", {}).get("parameter_size") or model.get("name", "")
+    match = SIZE_PATTERN.search(text.lower())
+    return float(match.group(1)) if match else None
+
+
+class ModelWarmer:
+    """Keeps the preferred model loaded and knows which models are warm"""
+
+    def __init__(self, settings: Settings,
+                 current_model: Optional[Callable[[], Awaitable[Optional[str]]]] = None):
+        self.settings = settings
+        self.current_model = current_model
+        self.selected: Optional[str] = None
+        self.installed: Dict[str, Dict[str, Any]] = {}
+        self.resident: Dict[str, Dict[str, Any]] = {}
+        self.last_refresh: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.fallbacks = 0
+        self.recent_loads: "deque[Dict[str, Any]]" = deque(maxlen=20)
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_ping: Optional[datetime] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.settings.ollama.base_url,
+                timeout=self.settings.ollama.timeout_seconds
+            )
+        return self._client
+
+    async def refresh(self):
+        """Update installed and resident models from /api/tags and /api/ps"""
+        client = self._http()
+        tags = await client.get("/api/tags")
+        tags.raise_for_status()
+        ps = await client.get("/api/ps")
+        ps.raise_for_status()
+        self.installed = {canonical_name(m["name"]): m for m in tags.json().get("models", [])}
+        self.resident = {canonical_name(m["name"]): m for m in ps.json().get("models", [])}
+        if self.current_model is not None:
+            try:
+                selected = await self.current_model()
+                self.selected = canonical_name(selected) if selected else None
+            except Exception as e:
+                logger.debug(f"Could not read the selected model: {e}")
+        self.last_refresh = datetime.utcnow().isoformat()
+
+    def preferred_model(self) -> Optional[str]:
+        """The service's selected model, else the first installed preferred model"""
+        if self.selected is not None and (not self.installed or self.selected in self.installed):
+            return self.selected
+        preferred = [canonical_name(name) for name in self.settings.ollama.preferred_models]
+        if not self.installed:
+            return preferred[0] if preferred else None
+        return next((name for name in preferred if name in self.installed), None)
+
+    async def load(self, model: str, reason: str) -> float:
+        """Load a model, or refresh its keep-alive, with an empty generate request"""
+        model = canonical_name(model)
+        task = self._loading.get(model)
+        if task is None:
+            task = asyncio.create_task(self._load(model, reason))
+            self._loading[model] = task
+            task.add_done_callback(lambda _: self._loading.pop(model, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, model: str, reason: str) -> float:
+        started = time.perf_counter()
+        response = await self._http().post("/api/generate", json={
+            "model": model,
+            "keep_alive": self.settings.ollama.keep_alive
+        })
+        response.raise_for_status()
+        elapsed = time.perf_counter() - started
+        self.resident.setdefault(model, self.installed.get(model, {"name": model}))
+        self.recent_loads.append({
+            "model": model,
+            "reason": reason,
+            "seconds": round(elapsed, 3),
+            "at": datetime.utcnow().isoformat()
+        })
+        if elapsed >= 1.0:
+            logger.info(f"Loaded {model} in {elapsed:.1f}s ({reason})")
+        return elapsed
+
+    def warm(self, model: str, reason: str):
+        """Start loading a model in the background"""
+        async def run():
+            try:
+                await self.load(model, reason)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Warming {model} failed: {e}")
+
+        if canonical_name(model) not in self._loading:
+            asyncio.create_task(run())
+
+    def choose(self, latency_sensitive: bool = False) -> Optional[str]:
+        """Model to use for a request; a warm substitute when latency matters and the preferred one is cold"""
+        preferred = self.preferred_model()
+        if (
+            not latency_sensitive
+            or not self.settings.ollama.latency_fallback
+            or preferred is None
+            or preferred in self.resident
+        ):
+            return preferred
+
+        minimum = self.settings.ollama.minimum_model_size_b
+        order = [canonical_name(name) for name in self.settings.ollama.preferred_models]
+        candidates = [
+            name for name, model in self.resident.items()
+            if (parameter_size_b(self.installed.get(name, model)) or minimum) >= minimum
+        ]
+        self.warm(preferred, "cold")
+        if not candidates:
+            return preferred
+
+        # Best-ranked resident preferred model, else the largest resident one
+        candidates.sort(key=lambda name: (
+            order.index(name) if name in order else len(order),
+            -(parameter_size_b(self.installed.get(name, self.resident[name])) or 0)
+        ))
+        self.fallbacks += 1
+        return candidates[0]
+
+    def _in_working_hours(self, now: datetime) -> bool:
+        try:
+            return CronSpec(self.settings.ollama.keep_warm_schedule).matches(now)
+        except ValueError as e:
+            self.last_error = str(e)
+            return False
+
+    async def preload(self):
+        """Load the preferred model if it is not resident already"""
+        try:
+            await self.refresh()
+            model = self.preferred_model()
+            if model is not None and model not in self.resident:
+                await self.load(model, "startup")
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Model preload skipped: {e}")
+
+    async def _run(self):
+        if self.settings.ollama.preload_on_startup:
+            await self.preload()
+        while True:
+            await asyncio.sleep(self.settings.ollama.resident_poll_seconds)
+            try:
+                await self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+
+            now = datetime.now().replace(second=0, microsecond=0)
+            if now != self._last_ping and self._in_working_hours(now):
+                self._last_ping = now
+                model = self.preferred_model()
+                if model is not None:
+                    self.warm(model, "keep-alive")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def apply_settings(self, settings: Settings):
+        old = self.settings.ollama
+        self.settings = settings
+        if self._client is not None and (
+            settings.ollama.base_url != old.base_url
+            or settings.ollama.timeout_seconds != old.timeout_seconds
+        ):
+            asyncio.create_task(self._client.aclose())
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "selected": self.selected,
+            "preferred": self.preferred_model(),
+            "resident": list(self.resident),
+            "loading": list(self._loading),
+            "fallbacks": self.fallbacks,
+            "recent_loads": list(self.recent_loads),
+            "last_refresh": self.last_refresh,
+            "last_error": self.last_error
+        }
@@ -6,8 +6,13 @@ from fastapi import WebSocket
 from typing import List, Dict, Any
 import json
 import logging
+import time
 from datetime import datetime
 
+from core.fast_json import dumps_text
+from core.metrics import WS_BROADCAST_LATENCY, WS_BROADCAST_RECIPIENTS, WS_MESSAGES_SENT
+from core.tracing import span
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,11 +35,11 @@ class WebSocketManager:
         logger.info(f"New WebSocket connection. Total: {len(self.active_connections)}")
         
         # Send welcome message
-        await websocket.send_json({
+        await websocket.send_text(dumps_text({
             "type": "connection_established",
             "message": "Connected to Ollama Excel Studio",
             "timestamp": datetime.utcnow().isoformat()
-        })
+        }))
     
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection"""
@@ -51,7 +56,8 @@ class WebSocketManager:
     async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket):
         """Send a message to a specific client"""
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(dumps_text(message))
+            WS_MESSAGES_SENT.inc()
             if websocket in self.connection_info:
                 self.connection_info[websocket]["messages_sent"] += 1
         except Exception as e:
@@ -61,18 +67,28 @@ class WebSocketManager:
     async def broadcast(self, message: Dict[str, Any], exclude: WebSocket = None):
         """Broadcast a message to all connected clients"""
         disconnected = []
+        started = time.perf_counter()
+        recipients = 0
+        
+        with span("websocket.broadcast", clients=len(self.active_connections)):
+            # Serialize once for every recipient
+            text = dumps_text(message)
+            for connection in self.active_connections:
+                if connection == exclude:
+                    continue
+                
+                try:
+                    await connection.send_text(text)
+                    WS_MESSAGES_SENT.inc()
+                    if connection in self.connection_info:
+                        self.connection_info[connection]["messages_sent"] += 1
+                    recipients += 1
+                except Exception as e:
+                    logger.error(f"Error broadcasting to client: {e}")
+                    disconnected.append(connection)
         
-        for connection in self.active_connections:
-            if connection == exclude:
-                continue
-            
-            try:
-                await connection.send_json(message)
-                if connection in self.connection_info:
-                    self.connection_info[connection]["messages_sent"] += 1
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
-                disconnected.append(connection)
+        WS_BROADCAST_LATENCY.observe(time.perf_counter() - started)
+        WS_BROADCAST_RECIPIENTS.observe(recipients)
         
         # Clean up disconnected clients
         for connection in disconnected:
@@ -88,6 +104,19 @@ class WebSocketManager:
             "timestamp": datetime.utcnow().isoformat()
         })
     
+    async def broadcast_file_delta(self, operation: str, files: List[Dict[str, Any]]):
+        """Broadcast the changed cells of one or more files as a single message
+
+        Stands in for file_updated: clients that refetch can use `filenames`.
+        """
+        await self.broadcast({
+            "type": "file_delta",
+            "operation": operation,
+            "filenames": [f["filename"] for f in files],
+            "files": files,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    
     async def broadcast_operation_progress(
         self,
         operation_id: str,